@@ -0,0 +1,291 @@
+"""
+Precomputed attack tables: knight, king and pawn attacks per square, the squares between two squares, rays for the
+list move generator, and magic bitboard tables for rooks and bishops.
+
+Slider attacks are a lookup indexed by the blockers on the piece's lines, hashed with a magic multiplier. Finding the
+multipliers takes a few seconds, so the tables are built once and written to config.ATTACK_TABLES_PATH with a
+version header. Later imports read that file in one go instead of rebuilding. A missing, outdated or damaged file is
+rebuilt. The file is only a fast serialization format: the tables are loaded into Python lists, because the move
+generators index them with Python ints millions of times and NumPy scalars would be slower there.
+"""
+import os
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import config
+
+# Squares are numbered square = y * 8 + x, so bit 0 is [0, 0] (black's queen rook) and bit 63 is [7, 7].
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+
+KNIGHT_OFFSETS = [[-2, -1], [-2, 1], [2, -1], [2, 1], [-1, -2], [1, -2], [-1, 2], [1, 2]]
+KING_OFFSETS = [[0, 1], [0, -1], [1, 0], [-1, 0], [1, 1], [1, -1], [-1, 1], [-1, -1]]
+STRAIGHT_STEPS = [[0, 1], [0, -1], [-1, 0], [1, 0]]
+DIAGONAL_STEPS = [[1, 1], [1, -1], [-1, 1], [-1, -1]]
+
+TABLES_MAGIC = b"CHESSATK"
+TABLES_VERSION = 1
+HEADER_SIZE = 32
+MAGIC_SEED = 20221106
+
+
+def build_offset_table(offsets: List[List[int]]) -> List[int]:
+    table = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        bb = 0
+        for dx, dy in offsets:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                bb |= 1 << ((y + dy) * 8 + x + dx)
+        table.append(bb)
+    return table
+
+
+def slide(bb: int, shift: int, mask: int, empty: int) -> int:
+    """Attacks of the sliders in bb along one direction, stopping on (and including) the first occupied square."""
+    attacks = 0
+    ray = bb
+    while ray:
+        if shift > 0:
+            ray = (ray << shift) & mask
+        else:
+            ray = (ray >> -shift) & mask
+        attacks |= ray
+        ray &= empty
+    return attacks
+
+
+STRAIGHT_DIRECTIONS = [[8, FULL], [-8, FULL], [1, NOT_FILE_A], [-1, NOT_FILE_H]]
+DIAGONAL_DIRECTIONS = [[9, NOT_FILE_A], [7, NOT_FILE_H], [-7, NOT_FILE_A], [-9, NOT_FILE_H]]
+
+
+def sliding_attacks(bb: int, occupied: int, directions: List[List[int]]) -> int:
+    empty = FULL ^ occupied
+    attacks = 0
+    for shift, mask in directions:
+        attacks |= slide(bb, shift, mask, empty)
+    return attacks
+
+
+def build_between_table() -> List[int]:
+    """Flat 64x64 table, entry a * 64 + b holds the squares strictly between a and b on a shared line, or 0."""
+    table = [0] * 4096
+    for sq in range(64):
+        for shift, mask in STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS:
+            ray = slide(1 << sq, shift, mask, FULL)
+            passed = 0
+            while ray:
+                lsb = ray & -ray if shift > 0 else 1 << (ray.bit_length() - 1)
+                table[sq * 64 + lsb.bit_length() - 1] = passed
+                passed |= lsb
+                ray ^= lsb
+    return table
+
+
+def get_relevant_mask(sq: int, directions: List[List[int]]) -> int:
+    """Squares whose occupancy can change the attacks from sq, the last square of every ray never blocks anything."""
+    mask = 0
+    for shift, direction_mask in directions:
+        ray = slide(1 << sq, shift, direction_mask, FULL)
+        if ray:
+            last = 1 << (ray.bit_length() - 1) if shift > 0 else ray & -ray
+            mask |= ray ^ last
+    return mask
+
+
+def find_magic(sq: int, directions: List[List[int]], rng: random.Random) -> Tuple[int, int, int, List[int]]:
+    """
+    Mask, magic, shift and attack table of one square. Tables get one index bit more than the mask has bits,
+    which makes magics far quicker to find in Python for twice the table size.
+    """
+    mask = get_relevant_mask(sq, directions)
+    bits = bin(mask).count("1") + 1
+    shift = 64 - bits
+    occupancies = []
+    attacks = []
+    subset = 0
+    while True:
+        occupancies.append(subset)
+        attacks.append(sliding_attacks(1 << sq, subset, directions))
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+
+    while True:
+        magic = rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+        table = [None] * (1 << bits)
+        for occupied, attacked in zip(occupancies, attacks):
+            index = ((occupied * magic) & FULL) >> shift
+            if table[index] is None:
+                table[index] = attacked
+            elif table[index] != attacked:
+                break
+        else:
+            return mask, magic, shift, [attacked or 0 for attacked in table]
+
+
+def build_magic_tables(directions: List[List[int]], rng: random.Random) -> Dict[str, List[int]]:
+    tables = {"masks": [], "magics": [], "shifts": [], "offsets": [], "attacks": []}
+    for sq in range(64):
+        mask, magic, shift, attacks = find_magic(sq, directions, rng)
+        tables["masks"].append(mask)
+        tables["magics"].append(magic)
+        tables["shifts"].append(shift)
+        tables["offsets"].append(len(tables["attacks"]))
+        tables["attacks"].extend(attacks)
+    return tables
+
+
+def build_tables() -> Dict[str, List[int]]:
+    rng = random.Random(MAGIC_SEED)
+    rook = build_magic_tables(STRAIGHT_DIRECTIONS, rng)
+    bishop = build_magic_tables(DIAGONAL_DIRECTIONS, rng)
+    white_pawns = [((1 << sq >> 9) & NOT_FILE_H) | ((1 << sq >> 7) & NOT_FILE_A) for sq in range(64)]
+    black_pawns = [((1 << sq << 7) & NOT_FILE_H & FULL) | ((1 << sq << 9) & NOT_FILE_A & FULL) for sq in range(64)]
+    tables = {
+        "knight": build_offset_table(KNIGHT_OFFSETS),
+        "king": build_offset_table(KING_OFFSETS),
+        "white_pawn": white_pawns,
+        "black_pawn": black_pawns,
+        "between": build_between_table(),
+    }
+    for prefix, magic_tables in [("rook", rook), ("bishop", bishop)]:
+        for name, values in magic_tables.items():
+            tables[f"{prefix}_{name}"] = values
+    return tables
+
+
+# Order of the sections in the cache file, every section but the two attack tables has 64 entries.
+SECTIONS = [
+    "knight",
+    "king",
+    "white_pawn",
+    "black_pawn",
+    "between",
+    "rook_masks",
+    "rook_magics",
+    "rook_shifts",
+    "rook_offsets",
+    "bishop_masks",
+    "bishop_magics",
+    "bishop_shifts",
+    "bishop_offsets",
+    "rook_attacks",
+    "bishop_attacks",
+]
+
+
+def get_header(rook_size: int, bishop_size: int) -> bytes:
+    version = TABLES_VERSION.to_bytes(4, "little") + MAGIC_SEED.to_bytes(4, "little")
+    return TABLES_MAGIC + version + rook_size.to_bytes(8, "little") + bishop_size.to_bytes(8, "little")
+
+
+def save_tables(path: str, tables: Dict[str, List[int]]):
+    header = get_header(len(tables["rook_attacks"]), len(tables["bishop_attacks"]))
+    data = np.concatenate([np.array(tables[name], dtype="<u8") for name in SECTIONS])
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(header)
+        f.write(data.tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def load_cached_tables(path: str) -> Dict[str, List[int]]:
+    """Tables from the cache file as Python lists, raises ValueError if it was written by another version or is damaged."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE:
+        raise ValueError(f"{path} is too short")
+    rook_size = int.from_bytes(header[16:24], "little")
+    bishop_size = int.from_bytes(header[24:32], "little")
+    if header != get_header(rook_size, bishop_size):
+        raise ValueError(f"{path} isn't a version {TABLES_VERSION} attack table cache")
+    sizes = {name: 64 for name in SECTIONS}
+    sizes["between"] = 4096
+    sizes["rook_attacks"] = rook_size
+    sizes["bishop_attacks"] = bishop_size
+    if os.path.getsize(path) != HEADER_SIZE + 8 * sum(sizes.values()):
+        raise ValueError(f"{path} has the wrong size")
+
+    data = np.fromfile(path, dtype="<u8", offset=HEADER_SIZE)
+    tables = {}
+    start = 0
+    for name in SECTIONS:
+        end = start + sizes[name]
+        tables[name] = data[start:end].tolist()
+        start = end
+    return tables
+
+
+def load_tables(path: str = config.ATTACK_TABLES_PATH) -> Dict[str, List[int]]:
+    try:
+        return load_cached_tables(path)
+    except (OSError, ValueError):
+        pass
+    tables = build_tables()
+    try:
+        save_tables(path, tables)
+    except OSError:
+        # A read-only install still works, it just builds the tables on every start.
+        pass
+    return tables
+
+
+def build_target_lists(table: List[int]) -> List[List[List[int]]]:
+    return [[[sq & 7, sq >> 3] for sq in range(64) if bb >> sq & 1] for bb in table]
+
+
+def build_rays(steps: List[List[int]]) -> List[List[List[List[int]]]]:
+    """Per square and step, the squares along the ray in order, ending at the edge of the board."""
+    rays = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        square_rays = []
+        for dx, dy in steps:
+            ray = []
+            new_x, new_y = x + dx, y + dy
+            while 0 <= new_x < 8 and 0 <= new_y < 8:
+                ray.append([new_x, new_y])
+                new_x, new_y = new_x + dx, new_y + dy
+            square_rays.append(ray)
+        rays.append(square_rays)
+    return rays
+
+
+TABLES = load_tables()
+KNIGHT_ATTACKS = TABLES["knight"]
+KING_ATTACKS = TABLES["king"]
+PAWN_ATTACKS = {True: TABLES["white_pawn"], False: TABLES["black_pawn"]}
+BETWEEN = [TABLES["between"][start:end] for start, end in zip(range(0, 4096, 64), range(64, 4160, 64))]
+
+ROOK_MASKS = TABLES["rook_masks"]
+ROOK_MAGICS = TABLES["rook_magics"]
+ROOK_SHIFTS = TABLES["rook_shifts"]
+ROOK_OFFSETS = TABLES["rook_offsets"]
+ROOK_ATTACKS = TABLES["rook_attacks"]
+BISHOP_MASKS = TABLES["bishop_masks"]
+BISHOP_MAGICS = TABLES["bishop_magics"]
+BISHOP_SHIFTS = TABLES["bishop_shifts"]
+BISHOP_OFFSETS = TABLES["bishop_offsets"]
+BISHOP_ATTACKS = TABLES["bishop_attacks"]
+
+KNIGHT_TARGETS = build_target_lists(KNIGHT_ATTACKS)
+KING_TARGETS = build_target_lists(KING_ATTACKS)
+PAWN_CAPTURE_TARGETS = {is_white: build_target_lists(table) for is_white, table in PAWN_ATTACKS.items()}
+STRAIGHT_RAYS = build_rays(STRAIGHT_STEPS)
+DIAGONAL_RAYS = build_rays(DIAGONAL_STEPS)
+
+
+def rook_attacks_from(sq: int, occupied: int) -> int:
+    index = (((occupied & ROOK_MASKS[sq]) * ROOK_MAGICS[sq]) & FULL) >> ROOK_SHIFTS[sq]
+    return ROOK_ATTACKS[ROOK_OFFSETS[sq] + index]
+
+
+def bishop_attacks_from(sq: int, occupied: int) -> int:
+    index = (((occupied & BISHOP_MASKS[sq]) * BISHOP_MAGICS[sq]) & FULL) >> BISHOP_SHIFTS[sq]
+    return BISHOP_ATTACKS[BISHOP_OFFSETS[sq] + index]
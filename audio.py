@@ -0,0 +1,133 @@
+"""
+Sound effects played by one long-lived worker thread, so a move never waits for a player process or audio I/O.
+
+The sounds are read from constants.SOUND_FOLDER into memory once and handed to a backend:
+- "winsound" plays them from memory on Windows.
+- "command" pipes them to a player such as aplay, or passes the file path to afplay on macOS.
+- "null" stays silent for headless runs.
+- "recording" keeps a list of what would have been played, for tests.
+"auto" picks the first of those that works on this machine.
+"""
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+import constants
+
+if platform.system() == "Windows":
+    import winsound
+
+SOUND_FILES = {"move": constants.SOUND_MOVE_FILE, "capture": constants.SOUND_CAPTURE_FILE}
+QUEUE_SIZE = 8
+
+
+def load_sounds(folder: str = constants.SOUND_FOLDER) -> Dict[str, bytes]:
+    sounds = {}
+    for name, file_name in SOUND_FILES.items():
+        with open(os.path.join(folder, file_name), "rb") as f:
+            sounds[name] = f.read()
+    return sounds
+
+
+class NullBackend:
+    def play(self, name: str, data: bytes):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingBackend(NullBackend):
+    def __init__(self):
+        self.played: List[Tuple[str, float]] = []
+
+    def play(self, name: str, data: bytes):
+        self.played.append((name, time.perf_counter()))
+
+
+class WinsoundBackend(NullBackend):
+    def play(self, name: str, data: bytes):
+        winsound.PlaySound(data, winsound.SND_MEMORY)
+
+
+class CommandBackend(NullBackend):
+    """Runs a player per sound, with the sound on stdin or, for players that only take files, its path appended."""
+
+    def __init__(self, command: List[str], use_stdin: bool = True, folder: str = constants.SOUND_FOLDER):
+        self.command = command
+        self.use_stdin = use_stdin
+        self.folder = folder
+
+    def play(self, name: str, data: bytes):
+        if self.use_stdin:
+            subprocess.run(self.command, input=data, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            path = os.path.join(self.folder, SOUND_FILES[name])
+            subprocess.run(self.command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def create_backend(name: str = config.AUDIO_BACKEND):
+    if name == "null":
+        return NullBackend()
+    if name == "recording":
+        return RecordingBackend()
+    if name == "winsound" or (name == "auto" and platform.system() == "Windows"):
+        return WinsoundBackend()
+    if name in ["command", "auto"]:
+        if shutil.which("afplay"):
+            return CommandBackend(["afplay"], use_stdin=False)
+        if shutil.which("aplay"):
+            return CommandBackend(["aplay", "-q", "-"])
+        if name == "command":
+            raise ValueError("No command line audio player found")
+        return NullBackend()
+    raise ValueError(f"Unknown audio backend {name}")
+
+
+class AudioWorker:
+    """
+    Plays queued sounds on a daemon thread. play only puts the sound on a short queue and returns, sounds that
+    arrive while the queue is full are dropped rather than delaying the game.
+    """
+
+    def __init__(self, backend=None, folder: str = constants.SOUND_FOLDER):
+        self.backend = backend if backend is not None else create_backend()
+        try:
+            self.sounds = load_sounds(folder)
+        except OSError as error:
+            print(f"Sounds are off, {error}")
+            self.sounds = {}
+        self.events: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def play(self, name: str):
+        if name not in self.sounds:
+            return
+        try:
+            self.events.put_nowait(name)
+        except queue.Full:
+            pass
+
+    def run(self):
+        while True:
+            name = self.events.get()
+            if name is None:
+                break
+            try:
+                self.backend.play(name, self.sounds[name])
+            except Exception as error:
+                print(f"Couldn't play {name}: {error}")
+
+    def stop(self):
+        try:
+            self.events.put_nowait(None)
+        except queue.Full:
+            pass
+        self.backend.close()
@@ -0,0 +1,344 @@
+"""
+Legal move generation and evaluation for many positions at once with NumPy.
+
+Positions are int8 8x8 boards indexed board[y, x] like config.STARTING_POSITION, with the codes in BATCH_PIECE_CODES
+(positive for white, negative for black, 0 for empty), a bool side to move per position and the en-passant square
+(y * 8 + x, or -1). Every step works on uint64 bitboard arrays of shape (N,). Positions with black to move are mirrored
+so all of them are generated from white's side, and the squares are mirrored back in the results. evaluate scores
+boards exactly like evaluation.evaluate scores games, for labelling datasets and tuning the weights.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from attack_tables import FULL, NOT_FILE_A, NOT_FILE_H
+from bitboard import BETWEEN, square
+from evaluation import (
+    KING_ZONE_ATTACK_WEIGHT,
+    KING_ZONES,
+    MOBILITY_WEIGHTS,
+    PAWN_SHIELD_WEIGHTS,
+    PAWN_SHIELDS,
+    PIECE_SQUARE_VALUES,
+)
+from game import Game
+
+BATCH_PIECE_CODES = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6, "p": -1, "n": -2, "b": -3, "r": -4, "q": -5, "k": -6}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+ZERO = np.uint64(0)
+ONE = np.uint64(1)
+# The masks of attack_tables as NumPy scalars, Python ints above 2**63 don't mix with uint64 arrays.
+FULL_U64 = np.uint64(FULL)
+NOT_FILE_A_U64 = np.uint64(NOT_FILE_A)
+NOT_FILE_AB_U64 = np.uint64(NOT_FILE_A & (NOT_FILE_A << 1))
+NOT_FILE_H_U64 = np.uint64(NOT_FILE_H)
+NOT_FILE_GH_U64 = np.uint64(NOT_FILE_H & (NOT_FILE_H >> 1))
+ROW_5 = np.uint64(0xFF << 40)
+
+# (shift, mask) per direction for ray_attacks, unlike the per-square rays of attack_tables.
+STRAIGHT_SHIFTS = [(8, FULL_U64), (-8, FULL_U64), (1, NOT_FILE_A_U64), (-1, NOT_FILE_H_U64)]
+DIAGONAL_SHIFTS = [(9, NOT_FILE_A_U64), (7, NOT_FILE_H_U64), (-7, NOT_FILE_A_U64), (-9, NOT_FILE_H_U64)]
+KNIGHT_STEPS = [
+    (-17, NOT_FILE_H_U64),
+    (-15, NOT_FILE_A_U64),
+    (-10, NOT_FILE_GH_U64),
+    (-6, NOT_FILE_AB_U64),
+    (6, NOT_FILE_GH_U64),
+    (10, NOT_FILE_AB_U64),
+    (15, NOT_FILE_H_U64),
+    (17, NOT_FILE_A_U64),
+]
+KING_STEPS = [
+    (-9, NOT_FILE_H_U64),
+    (-8, FULL_U64),
+    (-7, NOT_FILE_A_U64),
+    (-1, NOT_FILE_H_U64),
+    (1, NOT_FILE_A_U64),
+    (7, NOT_FILE_H_U64),
+    (8, FULL_U64),
+    (9, NOT_FILE_A_U64),
+]
+
+BETWEEN_TABLE = np.array(BETWEEN, dtype=np.uint64)
+SQUARE_BITS = np.array([1 << sq for sq in range(64)], dtype=np.uint64)
+
+# Material plus piece-square value of every code on every square, the row of a code is code + 6.
+PIECE_SQUARE_ARRAY = np.zeros((13, 64), dtype=np.int64)
+for _piece, _code in BATCH_PIECE_CODES.items():
+    PIECE_SQUARE_ARRAY[_code + 6] = PIECE_SQUARE_VALUES[_piece]
+MOBILITY_WEIGHT_ARRAY = np.array([0, 0] + [MOBILITY_WEIGHTS[piece_type] for piece_type in "nbrq"] + [0], dtype=np.int64)
+KING_ZONE_ARRAY = np.array(KING_ZONES, dtype=np.uint64)
+PAWN_SHIELD_ARRAYS = {is_white: np.array(shields, dtype=np.uint64) for is_white, shields in PAWN_SHIELDS.items()}
+
+
+class BatchMoves:
+    """Legal moves of a batch as flat arrays, move i belongs to position position_index[i]."""
+
+    def __init__(self, counts: np.ndarray, position_index: np.ndarray, from_squares: np.ndarray, to_squares: np.ndarray):
+        self.counts = counts
+        self.position_index = position_index
+        self.from_squares = from_squares
+        self.to_squares = to_squares
+
+    def get_moves(self, index: int) -> List[Tuple[List[int], List[int]]]:
+        selected = self.position_index == index
+        return [
+            ([int(from_sq) & 7, int(from_sq) >> 3], [int(to_sq) & 7, int(to_sq) >> 3])
+            for from_sq, to_sq in zip(self.from_squares[selected], self.to_squares[selected])
+        ]
+
+
+def encode_games(games: Sequence[Game]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Boards, side to move and en-passant squares of games in the batch format."""
+    boards = np.zeros((len(games), 8, 8), dtype=np.int8)
+    white_turn = np.zeros(len(games), dtype=bool)
+    en_passant = np.full(len(games), -1, dtype=np.int8)
+    for index, game in enumerate(games):
+        for piece_name, (x, y) in game.pieces_pos.items():
+            boards[index, y, x] = BATCH_PIECE_CODES[piece_name[0]]
+        white_turn[index] = game.white_turn
+        if game.en_passant:
+            en_passant[index] = square(game.en_passant)
+    return boards, white_turn, en_passant
+
+
+def shift(bb: np.ndarray, amount: int) -> np.ndarray:
+    if amount > 0:
+        return bb << np.uint64(amount)
+    return bb >> np.uint64(-amount)
+
+
+def popcount(bb: np.ndarray) -> np.ndarray:
+    bb = bb - ((bb >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    bb = (bb & np.uint64(0x3333333333333333)) + ((bb >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    bb = (bb + (bb >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((bb * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def lowest_square(bb: np.ndarray) -> np.ndarray:
+    """Index of the lowest set bit, 0 for empty bitboards."""
+    lsb = bb & (~bb + ONE)
+    return np.log2(np.maximum(lsb, ONE).astype(np.float64)).astype(np.int64)
+
+
+def step_attacks(bb: np.ndarray, steps: List) -> np.ndarray:
+    attacks = np.zeros_like(bb)
+    for amount, mask in steps:
+        attacks |= shift(bb, amount) & mask
+    return attacks
+
+
+def ray_attacks(bb: np.ndarray, empty: np.ndarray, rays: List) -> np.ndarray:
+    """Attacks of all sliders in bb along the rays, including the first blocker on each ray."""
+    attacks = np.zeros_like(bb)
+    for amount, mask in rays:
+        masked_empty = empty & mask
+        flood = bb
+        generator = bb
+        for _ in range(6):
+            generator = shift(generator, amount) & masked_empty
+            flood = flood | generator
+        attacks |= shift(flood, amount) & mask
+    return attacks
+
+
+def white_pawn_attacks(bb: np.ndarray) -> np.ndarray:
+    return ((bb >> np.uint64(9)) & NOT_FILE_H_U64) | ((bb >> np.uint64(7)) & NOT_FILE_A_U64)
+
+
+def black_pawn_attacks(bb: np.ndarray) -> np.ndarray:
+    return ((bb << np.uint64(7)) & NOT_FILE_H_U64) | ((bb << np.uint64(9)) & NOT_FILE_A_U64)
+
+
+def to_bitboards(squares: np.ndarray) -> np.ndarray:
+    """(N, 64) bool array to (N,) uint64 bitboards."""
+    return np.packbits(squares, axis=1, bitorder="little").view("<u8")[:, 0].astype(np.uint64)
+
+
+def get_legal_moves(boards: np.ndarray, white_turn: np.ndarray, en_passant: np.ndarray) -> BatchMoves:
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    white_turn = np.asarray(white_turn, dtype=bool)
+    en_passant = np.asarray(en_passant, dtype=np.int64)
+    count = len(boards)
+
+    # Mirror black-to-move positions vertically and swap colors, so white is always to move.
+    flip = ~white_turn
+    boards = boards.copy()
+    boards[flip] = -boards[flip].reshape(-1, 8, 8)[:, ::-1, :].reshape(-1, 64)
+    en_passant = np.where(flip & (en_passant >= 0), en_passant ^ 56, en_passant)
+
+    own = {code: to_bitboards(boards == code) for code in range(1, 7)}
+    opponent = {code: to_bitboards(boards == -code) for code in range(1, 7)}
+    own_all = to_bitboards(boards > 0)
+    opponent_all = to_bitboards(boards < 0)
+    occupied = own_all | opponent_all
+    empty = ~occupied
+    ep_bb = np.where(en_passant >= 0, SQUARE_BITS[np.maximum(en_passant, 0)], ZERO)
+
+    king = own[KING]
+    king_sq = lowest_square(king)
+    opponent_rooks = opponent[ROOK] | opponent[QUEEN]
+    opponent_bishops = opponent[BISHOP] | opponent[QUEEN]
+
+    checkers = (
+        (step_attacks(king, KNIGHT_STEPS) & opponent[KNIGHT])
+        | (white_pawn_attacks(king) & opponent[PAWN])
+        | (ray_attacks(king, empty, STRAIGHT_SHIFTS) & opponent_rooks)
+        | (ray_attacks(king, empty, DIAGONAL_SHIFTS) & opponent_bishops)
+    )
+    single_check = (checkers != ZERO) & ((checkers & (checkers - ONE)) == ZERO)
+    check_mask = np.where(checkers == ZERO, FULL_U64, ZERO)
+    check_mask = np.where(single_check, checkers | BETWEEN_TABLE[king_sq, lowest_square(checkers)], check_mask)
+
+    empty_without_king = empty | king
+    king_danger = (
+        black_pawn_attacks(opponent[PAWN])
+        | step_attacks(opponent[KNIGHT], KNIGHT_STEPS)
+        | step_attacks(opponent[KING], KING_STEPS)
+        | ray_attacks(opponent_rooks, empty_without_king, STRAIGHT_SHIFTS)
+        | ray_attacks(opponent_bishops, empty_without_king, DIAGONAL_SHIFTS)
+    )
+
+    # Each sniper is an opponent slider that would hit the king if only opponent pieces blocked.
+    opponent_empty = ~opponent_all
+    snipers = (ray_attacks(king, opponent_empty, STRAIGHT_SHIFTS) & opponent_rooks) | (
+        ray_attacks(king, opponent_empty, DIAGONAL_SHIFTS) & opponent_bishops
+    )
+    pinned_pieces = []
+    while np.any(snipers):
+        sniper = snipers & (~snipers + ONE)
+        ray = BETWEEN_TABLE[king_sq, lowest_square(sniper)]
+        blockers = ray & occupied
+        is_pin = (sniper != ZERO) & (blockers != ZERO) & ((blockers & (blockers - ONE)) == ZERO) & ((blockers & own_all) != ZERO)
+        pinned_pieces.append((np.where(is_pin, blockers, ZERO), ray | sniper))
+        snipers ^= sniper
+
+    own_squares = boards > 0
+    slot_count = int(own_squares.sum(axis=1).max()) if count else 0
+    slot_squares = np.argsort(~own_squares, axis=1, kind="stable")[:, :slot_count]
+    slot_valid = np.take_along_axis(own_squares, slot_squares, axis=1)
+    slot_types = np.take_along_axis(boards, slot_squares, axis=1)
+
+    position_indexes = []
+    from_squares = []
+    to_squares = []
+    counts = np.zeros(count, dtype=np.int64)
+    for slot in range(slot_count):
+        sq = slot_squares[:, slot]
+        piece_type = slot_types[:, slot]
+        bb = np.where(slot_valid[:, slot], SQUARE_BITS[sq], ZERO)
+
+        straight = ray_attacks(bb, empty, STRAIGHT_SHIFTS)
+        diagonal = ray_attacks(bb, empty, DIAGONAL_SHIFTS)
+        single_push = (bb >> np.uint64(8)) & empty
+        double_push = ((single_push & ROW_5) >> np.uint64(8)) & empty
+        pawn_moves = single_push | double_push | (white_pawn_attacks(bb) & (opponent_all | ep_bb))
+        targets = np.select(
+            [piece_type == PAWN, piece_type == KNIGHT, piece_type == BISHOP, piece_type == ROOK, piece_type == QUEEN],
+            [pawn_moves, step_attacks(bb, KNIGHT_STEPS), diagonal, straight, straight | diagonal],
+            default=step_attacks(bb, KING_STEPS),
+        )
+        targets &= ~own_all
+
+        pin_ray = np.full(count, FULL_U64, dtype=np.uint64)
+        for pinned, ray in pinned_pieces:
+            pin_ray = np.where((pinned & bb) != ZERO, ray, pin_ray)
+
+        is_pawn = piece_type == PAWN
+        en_passant_targets = np.where(is_pawn, targets & ep_bb, ZERO)
+        legal = np.where(piece_type == KING, targets & ~king_danger, (targets ^ en_passant_targets) & check_mask & pin_ray)
+
+        # The en-passant capture removes a pawn that isn't on the target square, so it is checked by playing it out.
+        has_en_passant = en_passant_targets != ZERO
+        if np.any(has_en_passant):
+            captured = ep_bb << np.uint64(8)
+            empty_after = ~((occupied ^ bb ^ captured) | ep_bb)
+            attacked = (
+                (ray_attacks(king, empty_after, STRAIGHT_SHIFTS) & opponent_rooks)
+                | (ray_attacks(king, empty_after, DIAGONAL_SHIFTS) & opponent_bishops)
+                | (step_attacks(king, KNIGHT_STEPS) & opponent[KNIGHT])
+                | (white_pawn_attacks(king) & opponent[PAWN] & ~captured)
+            )
+            legal |= np.where(has_en_passant & (attacked == ZERO), en_passant_targets, ZERO)
+
+        legal = np.where(slot_valid[:, slot], legal, ZERO)
+        counts += popcount(legal)
+
+        target_bits = np.unpackbits(legal.astype("<u8").view(np.uint8).reshape(count, 8), axis=1, bitorder="little")
+        position_index, to_sq = np.nonzero(target_bits)
+        position_indexes.append(position_index)
+        from_squares.append(sq[position_index])
+        to_squares.append(to_sq)
+
+    if slot_count:
+        position_index = np.concatenate(position_indexes)
+        from_sq = np.concatenate(from_squares)
+        to_sq = np.concatenate(to_squares)
+    else:
+        position_index = from_sq = to_sq = np.zeros(0, dtype=np.int64)
+    order = np.argsort(position_index, kind="stable")
+    position_index, from_sq, to_sq = position_index[order], from_sq[order], to_sq[order]
+    mirrored = flip[position_index]
+    from_sq = np.where(mirrored, from_sq ^ 56, from_sq)
+    to_sq = np.where(mirrored, to_sq ^ 56, to_sq)
+
+    return BatchMoves(counts=counts, position_index=position_index, from_squares=from_sq, to_squares=to_sq)
+
+
+def count_legal_moves(boards: np.ndarray, white_turn: np.ndarray, en_passant: np.ndarray) -> np.ndarray:
+    return get_legal_moves(boards=boards, white_turn=white_turn, en_passant=en_passant).counts
+
+
+def get_mobility(codes: np.ndarray, is_white: bool, occupied: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mobility of one side and every square its pawns and pieces attack, codes are positive for that side."""
+    count = len(codes)
+    own = to_bitboards(codes > 0)
+    empty = ~occupied
+    pawns = to_bitboards(codes == PAWN)
+    attacked = white_pawn_attacks(pawns) if is_white else black_pawn_attacks(pawns)
+    mobility = np.zeros(count, dtype=np.int64)
+
+    is_piece = (codes >= KNIGHT) & (codes <= QUEEN)
+    slot_count = int(is_piece.sum(axis=1).max()) if count else 0
+    slot_squares = np.argsort(~is_piece, axis=1, kind="stable")[:, :slot_count]
+    slot_valid = np.take_along_axis(is_piece, slot_squares, axis=1)
+    slot_types = np.where(slot_valid, np.take_along_axis(codes, slot_squares, axis=1), 0)
+    for slot in range(slot_count):
+        piece_type = slot_types[:, slot]
+        bb = np.where(slot_valid[:, slot], SQUARE_BITS[slot_squares[:, slot]], ZERO)
+        straight = ray_attacks(bb, empty, STRAIGHT_SHIFTS)
+        diagonal = ray_attacks(bb, empty, DIAGONAL_SHIFTS)
+        attacks = np.select(
+            [piece_type == KNIGHT, piece_type == BISHOP, piece_type == ROOK, piece_type == QUEEN],
+            [step_attacks(bb, KNIGHT_STEPS), diagonal, straight, straight | diagonal],
+            default=ZERO,
+        )
+        attacked |= attacks
+        mobility += MOBILITY_WEIGHT_ARRAY[piece_type] * popcount(attacks & ~own)
+    return mobility, attacked
+
+
+def get_king_safety(codes: np.ndarray, is_white: bool, opponent_attacked: np.ndarray) -> np.ndarray:
+    is_king = codes == KING
+    king_sq = np.argmax(is_king, axis=1)
+    pawns = to_bitboards(codes == PAWN)
+    safety = -KING_ZONE_ATTACK_WEIGHT * popcount(KING_ZONE_ARRAY[king_sq] & opponent_attacked)
+    shields = PAWN_SHIELD_ARRAYS[is_white][king_sq]
+    for index, weight in enumerate(PAWN_SHIELD_WEIGHTS):
+        safety += weight * popcount(shields[:, index] & pawns)
+    return np.where(is_king.any(axis=1), safety, 0)
+
+
+def evaluate(boards: np.ndarray) -> np.ndarray:
+    """Scores of the positions in centipawns from white's side, the same as evaluation.evaluate gives."""
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    scores = PIECE_SQUARE_ARRAY[boards + 6, np.arange(64)].sum(axis=1)
+    occupied = to_bitboards(boards != 0)
+    white_codes, black_codes = boards, -boards
+    white_mobility, white_attacked = get_mobility(white_codes, is_white=True, occupied=occupied)
+    black_mobility, black_attacked = get_mobility(black_codes, is_white=False, occupied=occupied)
+    scores += white_mobility - black_mobility
+    scores += get_king_safety(white_codes, is_white=True, opponent_attacked=black_attacked)
+    scores -= get_king_safety(black_codes, is_white=False, opponent_attacked=white_attacked)
+    return scores
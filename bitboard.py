@@ -0,0 +1,345 @@
+from typing import Dict, Iterator, List
+
+import config
+from attack_tables import (
+    BETWEEN,
+    DIAGONAL_DIRECTIONS,
+    FULL,
+    KING_ATTACKS,
+    KNIGHT_ATTACKS,
+    NOT_FILE_A,
+    NOT_FILE_H,
+    PAWN_ATTACKS,
+    STRAIGHT_DIRECTIONS,
+    bishop_attacks_from,
+    rook_attacks_from,
+    sliding_attacks,
+)
+from moves import CAPTURE, DOUBLE_PUSH, EN_PASSANT, FLAGS_SHIFT, MoveBuffer, TO_SHIFT
+
+ROW_2 = 0xFF << 16
+ROW_5 = 0xFF << 40
+CAPTURE_FLAG = CAPTURE << FLAGS_SHIFT
+DOUBLE_PUSH_FLAG = DOUBLE_PUSH << FLAGS_SHIFT
+EN_PASSANT_FLAG = (EN_PASSANT | CAPTURE) << FLAGS_SHIFT
+
+
+def square(pos: List[int]) -> int:
+    return pos[1] * 8 + pos[0]
+
+
+def position(sq: int) -> List[int]:
+    return [sq & 7, sq >> 3]
+
+
+def to_positions(bb: int) -> List[List[int]]:
+    positions = []
+    while bb:
+        lsb = bb & -bb
+        sq = lsb.bit_length() - 1
+        positions.append([sq & 7, sq >> 3])
+        bb ^= lsb
+    return positions
+
+
+def rook_attacks(bb: int, occupied: int) -> int:
+    """Attacks of every rook in bb. Single squares are faster with rook_attacks_from."""
+    return sliding_attacks(bb, occupied, STRAIGHT_DIRECTIONS)
+
+
+def bishop_attacks(bb: int, occupied: int) -> int:
+    """Attacks of every bishop in bb. Single squares are faster with bishop_attacks_from."""
+    return sliding_attacks(bb, occupied, DIAGONAL_DIRECTIONS)
+
+
+def pawn_attacks(bb: int, is_white: bool) -> int:
+    if is_white:
+        return ((bb >> 9) & NOT_FILE_H) | ((bb >> 7) & NOT_FILE_A)
+    return ((bb << 7) & NOT_FILE_H & FULL) | ((bb << 9) & NOT_FILE_A & FULL)
+
+
+def pawn_pushes(bb: int, is_white: bool, empty: int) -> int:
+    if is_white:
+        single = (bb >> 8) & empty
+        return single | (((single & ROW_5) >> 8) & empty)
+    single = (bb << 8) & empty & FULL
+    return single | (((single & ROW_2) << 8) & empty)
+
+
+def iterate_targets(from_sq: int, targets: int, opponent: int) -> Iterator[int]:
+    """Encoded moves from from_sq to every square of targets."""
+    while targets:
+        lsb = targets & -targets
+        if lsb & opponent:
+            yield from_sq | (lsb.bit_length() - 1) << TO_SHIFT | CAPTURE_FLAG
+        else:
+            yield from_sq | (lsb.bit_length() - 1) << TO_SHIFT
+        targets ^= lsb
+
+
+class CheckInfo:
+    """Checks and pins against the king of the side to move, computed once per position."""
+
+    __slots__ = ("is_white", "king_sq", "checkers", "king_danger", "pin_rays", "check_mask")
+
+    def __init__(self, is_white: bool, king_sq: int, checkers: int, king_danger: int, pin_rays: Dict[int, int]):
+        self.is_white = is_white
+        self.king_sq = king_sq
+        self.checkers = checkers
+        self.king_danger = king_danger
+        self.pin_rays = pin_rays
+        if checkers == 0:
+            self.check_mask = FULL
+        elif checkers & (checkers - 1) == 0:
+            checker_sq = checkers.bit_length() - 1
+            self.check_mask = checkers | BETWEEN[king_sq][checker_sq]
+        else:
+            self.check_mask = 0
+
+
+class Bitboards:
+    """One 64-bit integer per piece type and color, kept in sync with Game.pieces_pos."""
+
+    __slots__ = ("pieces", "white", "black")
+
+    def __init__(self):
+        self.pieces = {piece_type: 0 for piece_type in config.PIECE_TYPES}
+        self.white = 0
+        self.black = 0
+
+    @classmethod
+    def from_pieces_pos(cls, pieces_pos: Dict[str, List[int]]) -> "Bitboards":
+        bitboards = cls()
+        for piece_name, pos in pieces_pos.items():
+            bitboards.add_piece(piece=piece_name[0], pos=pos)
+        return bitboards
+
+    @property
+    def occupied(self) -> int:
+        return self.white | self.black
+
+    def add_piece(self, piece: str, pos: List[int]):
+        bit = 1 << square(pos)
+        self.pieces[piece] |= bit
+        if piece.isupper():
+            self.white |= bit
+        else:
+            self.black |= bit
+
+    def remove_piece(self, piece: str, pos: List[int]):
+        mask = FULL ^ (1 << square(pos))
+        self.pieces[piece] &= mask
+        if piece.isupper():
+            self.white &= mask
+        else:
+            self.black &= mask
+
+    def move_piece(self, piece: str, old_pos: List[int], new_pos: List[int]):
+        self.remove_piece(piece=piece, pos=old_pos)
+        self.add_piece(piece=piece, pos=new_pos)
+
+    def get_moves_bitboard(self, piece: str, pos: List[int], en_passant: List = []) -> int:
+        is_white = piece.isupper()
+        if is_white:
+            own, opponent = self.white, self.black
+        else:
+            own, opponent = self.black, self.white
+        sq = square(pos)
+        bb = 1 << sq
+        piece_type = piece.lower()
+
+        if piece_type == "n":
+            return KNIGHT_ATTACKS[sq] & ~own
+        elif piece_type == "k":
+            return KING_ATTACKS[sq] & ~own
+        elif piece_type == "b":
+            return bishop_attacks_from(sq, own | opponent) & ~own
+        elif piece_type == "r":
+            return rook_attacks_from(sq, own | opponent) & ~own
+        elif piece_type == "q":
+            occupied = own | opponent
+            return (rook_attacks_from(sq, occupied) | bishop_attacks_from(sq, occupied)) & ~own
+        elif piece_type == "p":
+            if len(en_passant) > 0:
+                opponent |= 1 << square(en_passant)
+            empty = FULL ^ (own | opponent)
+            return pawn_pushes(bb, is_white, empty) | (PAWN_ATTACKS[is_white][sq] & opponent)
+        return 0
+
+    def get_attackers(self, sq: int, by_white: bool, occupied: int) -> int:
+        if by_white:
+            pawns, knights, bishops, rooks, queens, king = [self.pieces[piece] for piece in "PNBRQK"]
+        else:
+            pawns, knights, bishops, rooks, queens, king = [self.pieces[piece] for piece in "pnbrqk"]
+        return (
+            (PAWN_ATTACKS[not by_white][sq] & pawns)
+            | (KNIGHT_ATTACKS[sq] & knights)
+            | (KING_ATTACKS[sq] & king)
+            | (rook_attacks_from(sq, occupied) & (rooks | queens))
+            | (bishop_attacks_from(sq, occupied) & (bishops | queens))
+        )
+
+    def get_attacked_squares(self, by_white: bool, occupied: int) -> int:
+        if by_white:
+            pawns, knights, bishops, rooks, queens, king = [self.pieces[piece] for piece in "PNBRQK"]
+        else:
+            pawns, knights, bishops, rooks, queens, king = [self.pieces[piece] for piece in "pnbrqk"]
+        attacked = pawn_attacks(pawns, by_white)
+        while knights:
+            lsb = knights & -knights
+            attacked |= KNIGHT_ATTACKS[lsb.bit_length() - 1]
+            knights ^= lsb
+        straight = rooks | queens
+        while straight:
+            lsb = straight & -straight
+            attacked |= rook_attacks_from(lsb.bit_length() - 1, occupied)
+            straight ^= lsb
+        diagonal = bishops | queens
+        while diagonal:
+            lsb = diagonal & -diagonal
+            attacked |= bishop_attacks_from(lsb.bit_length() - 1, occupied)
+            diagonal ^= lsb
+        if king:
+            attacked |= KING_ATTACKS[king.bit_length() - 1]
+        return attacked
+
+    def get_check_info(self, is_white: bool) -> CheckInfo:
+        if is_white:
+            king, own, opponent = self.pieces["K"], self.white, self.black
+            opponent_rooks = self.pieces["r"] | self.pieces["q"]
+            opponent_bishops = self.pieces["b"] | self.pieces["q"]
+        else:
+            king, own, opponent = self.pieces["k"], self.black, self.white
+            opponent_rooks = self.pieces["R"] | self.pieces["Q"]
+            opponent_bishops = self.pieces["B"] | self.pieces["Q"]
+        king_sq = king.bit_length() - 1
+        occupied = own | opponent
+
+        checkers = self.get_attackers(king_sq, by_white=not is_white, occupied=occupied)
+        king_danger = self.get_attacked_squares(by_white=not is_white, occupied=occupied ^ king)
+
+        pin_rays = {}
+        snipers = rook_attacks_from(king_sq, opponent) & opponent_rooks
+        snipers |= bishop_attacks_from(king_sq, opponent) & opponent_bishops
+        while snipers:
+            lsb = snipers & -snipers
+            sniper_sq = lsb.bit_length() - 1
+            blockers = BETWEEN[king_sq][sniper_sq] & occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+                pin_rays[blockers.bit_length() - 1] = BETWEEN[king_sq][sniper_sq] | lsb
+            snipers ^= lsb
+
+        return CheckInfo(is_white=is_white, king_sq=king_sq, checkers=checkers, king_danger=king_danger, pin_rays=pin_rays)
+
+    def is_legal_move(
+        self, check_info: CheckInfo, piece: str, from_pos: List[int], to_pos: List[int], en_passant: List = []
+    ) -> bool:
+        from_sq = square(from_pos)
+        to_sq = square(to_pos)
+        to_bit = 1 << to_sq
+        piece_type = piece.lower()
+
+        if piece_type == "k":
+            return not check_info.king_danger & to_bit
+
+        if piece_type == "p" and to_pos == en_passant:
+            # The captured pawn is not on the target square, so the pin and check masks can't be used.
+            if check_info.is_white:
+                captured_sq = to_sq + 8
+            else:
+                captured_sq = to_sq - 8
+            occupied = (self.occupied ^ (1 << from_sq) ^ (1 << captured_sq)) | to_bit
+            attackers = self.get_attackers(check_info.king_sq, by_white=not check_info.is_white, occupied=occupied)
+            return attackers & ~(1 << captured_sq) == 0
+
+        if not check_info.check_mask & to_bit:
+            return False
+        if from_sq in check_info.pin_rays:
+            return bool(check_info.pin_rays[from_sq] & to_bit)
+        return True
+
+    def calculate_possible_moves(self, piece: str, pos: List[int], en_passant: List = []) -> List:
+        return to_positions(self.get_moves_bitboard(piece=piece, pos=pos, en_passant=en_passant))
+
+    def iterate_moves(self, check_info: CheckInfo, en_passant_sq: int) -> Iterator[int]:
+        """
+        Encoded legal moves of the side to move, produced lazily one piece at a time, so a caller looking for any
+        legal move stops after the first. Whole target sets are masked with the check and pin rays, so only en
+        passant needs a test per move. King moves come first, as they are the only ones left in double check.
+        """
+        is_white = check_info.is_white
+        if is_white:
+            own, opponent = self.white, self.black
+            pawns, knights, bishops, rooks, queens = [self.pieces[piece] for piece in "PNBRQ"]
+        else:
+            own, opponent = self.black, self.white
+            pawns, knights, bishops, rooks, queens = [self.pieces[piece] for piece in "pnbrq"]
+        occupied = own | opponent
+        not_own = FULL ^ own
+        king_sq = check_info.king_sq
+        yield from iterate_targets(king_sq, KING_ATTACKS[king_sq] & not_own & ~check_info.king_danger, opponent)
+
+        check_mask = check_info.check_mask
+        if check_mask == 0:
+            return
+        allowed = not_own & check_mask
+        pin_rays = check_info.pin_rays
+
+        while knights:
+            lsb = knights & -knights
+            from_sq = lsb.bit_length() - 1
+            if from_sq not in pin_rays:
+                yield from iterate_targets(from_sq, KNIGHT_ATTACKS[from_sq] & allowed, opponent)
+            knights ^= lsb
+        for sliders, attacks_from in [(bishops | queens, bishop_attacks_from), (rooks | queens, rook_attacks_from)]:
+            while sliders:
+                lsb = sliders & -sliders
+                from_sq = lsb.bit_length() - 1
+                targets = attacks_from(from_sq, occupied) & allowed
+                if from_sq in pin_rays:
+                    targets &= pin_rays[from_sq]
+                yield from iterate_targets(from_sq, targets, opponent)
+                sliders ^= lsb
+
+        empty = FULL ^ occupied
+        pawn_captures = PAWN_ATTACKS[is_white]
+        while pawns:
+            lsb = pawns & -pawns
+            from_sq = lsb.bit_length() - 1
+            pushes = pawn_pushes(lsb, is_white, empty) & check_mask
+            captures = pawn_captures[from_sq] & opponent & check_mask
+            if from_sq in pin_rays:
+                pushes &= pin_rays[from_sq]
+                captures &= pin_rays[from_sq]
+            while pushes:
+                push = pushes & -pushes
+                to_sq = push.bit_length() - 1
+                if to_sq - from_sq in (16, -16):
+                    yield from_sq | to_sq << TO_SHIFT | DOUBLE_PUSH_FLAG
+                else:
+                    yield from_sq | to_sq << TO_SHIFT
+                pushes ^= push
+            yield from iterate_targets(from_sq, captures, opponent)
+            if en_passant_sq >= 0 and pawn_captures[from_sq] >> en_passant_sq & 1:
+                # The captured pawn is not on the target square, so the pin and check masks can't be used.
+                captured_sq = en_passant_sq + 8 if is_white else en_passant_sq - 8
+                after = (occupied ^ lsb ^ (1 << captured_sq)) | (1 << en_passant_sq)
+                attackers = self.get_attackers(king_sq, by_white=not is_white, occupied=after)
+                if attackers & ~(1 << captured_sq) == 0:
+                    yield from_sq | en_passant_sq << TO_SHIFT | EN_PASSANT_FLAG
+            pawns ^= lsb
+
+    def generate_moves(self, check_info: CheckInfo, en_passant_sq: int, buffer: MoveBuffer) -> int:
+        """Writes the encoded legal moves of the side to move into buffer and returns how many there are."""
+        moves = buffer.moves
+        count = 0
+        for move in self.iterate_moves(check_info, en_passant_sq):
+            moves[count] = move
+            count += 1
+        buffer.count = count
+        return count
+
+    def has_legal_move(self, check_info: CheckInfo, en_passant_sq: int) -> bool:
+        for _ in self.iterate_moves(check_info, en_passant_sq):
+            return True
+        return False
@@ -0,0 +1,160 @@
+"""
+Opening book stored as a sorted file of (Zobrist key, from square, to square, weight) records.
+
+The file is memory-mapped and searched by binary search. Opening it costs nothing up front, and a lookup only
+touches the few pages the search visits, so books with millions of entries answer in microseconds.
+Weights are the number of times a move was played in the games the book was built from.
+
+    python book.py games.pgn resources/book.bin --max-ply 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from bitboard import square
+from fen import STARTING_FEN, parse_fen
+from game import Game
+from pgn import IngestStats, SanError, read_pgn, resolve_san
+
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("from_square", "u1"), ("to_square", "u1"), ("weight", "<u4")])
+BOOK_MAGIC = b"CHESSBK\0"
+BOOK_VERSION = 1
+HEADER_SIZE = 16
+
+BookMove = Tuple[str, List[int], int]
+
+
+def get_header() -> bytes:
+    return BOOK_MAGIC + BOOK_VERSION.to_bytes(4, "little") + BOOK_DTYPE.itemsize.to_bytes(4, "little")
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header != get_header():
+            raise ValueError(f"{path} isn't a version {BOOK_VERSION} opening book")
+        count = (os.path.getsize(path) - HEADER_SIZE) // BOOK_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=BOOK_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=BOOK_DTYPE)
+        self.keys = self.records["key"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def find_first(self, key: int) -> int:
+        """Index of the first record with a key not below key."""
+        low, high = 0, len(self.keys)
+        while low < high:
+            middle = (low + high) // 2
+            if int(self.keys[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_moves(self, game: Game) -> List[BookMove]:
+        """Book moves of the position that are legal in it, as (piece name, new position, weight)."""
+        moves = []
+        index = self.find_first(game.zobrist_key)
+        while index < len(self.keys) and int(self.keys[index]) == game.zobrist_key:
+            record = self.records[index]
+            index += 1
+            from_sq, to_sq = int(record["from_square"]), int(record["to_square"])
+            piece_name = game.board[from_sq]
+            if piece_name is None or piece_name[0].isupper() != game.white_turn:
+                continue
+            new_pos = [to_sq & 7, to_sq >> 3]
+            # Guards against key collisions and books built by an older version of the rules.
+            if new_pos in game.get_possible_moves_per_piece(piece_name=piece_name):
+                moves.append((piece_name, new_pos, int(record["weight"])))
+        return moves
+
+    def choose_move(self, game: Game, rng: random.Random = random) -> Optional[Tuple[str, List[int]]]:
+        """Random book move picked in proportion to its weight, or None when the position isn't in the book."""
+        moves = self.get_moves(game)
+        if not moves:
+            return None
+        piece_name, new_pos, _ = rng.choices(moves, weights=[weight for _, _, weight in moves])[0]
+        return piece_name, new_pos
+
+
+def open_book(path: Optional[str] = config.BOOK_PATH) -> Optional[OpeningBook]:
+    """The book at path, or None when there is no book file."""
+    if path is None or not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def build_book(pgn_paths: List[str], output: str, max_ply: int = config.BOOK_MAX_PLY, min_weight: int = 1) -> IngestStats:
+    """
+    Replays the first max_ply moves of every game and writes how often each move was played from each position.
+    Games with a SetUp or FEN header are replayed from that position and skipped if it isn't valid.
+    Games are followed up to their first move the rules can't replay, the moves before it still count.
+    """
+    stats = IngestStats()
+    weights: Dict[Tuple[int, int, int], int] = {}
+    for path in pgn_paths:
+        for pgn_game in read_pgn(path):
+            if pgn_game.headers.get("SetUp") == "1" or "FEN" in pgn_game.headers:
+                try:
+                    game = parse_fen(pgn_game.headers.get("FEN", STARTING_FEN))
+                except ValueError:
+                    stats.add(False)
+                    continue
+            else:
+                game = Game()
+            is_valid = True
+            for san in pgn_game.moves[:max_ply]:
+                try:
+                    piece_name, new_pos = resolve_san(game=game, san=san)
+                except SanError:
+                    is_valid = False
+                    break
+                entry = (game.zobrist_key, square(game.pieces_pos[piece_name]), square(new_pos))
+                weights[entry] = weights.get(entry, 0) + 1
+                game.make_move(piece_name=piece_name, new_pos=new_pos)
+            stats.add(is_valid)
+
+    records = np.array(
+        [entry + (weight,) for entry, weight in weights.items() if weight >= min_weight],
+        dtype=BOOK_DTYPE,
+    )
+    records.sort(order=["key", "from_square", "to_square"])
+    with open(output, "wb") as f:
+        f.write(get_header())
+        f.write(records.tobytes())
+    return stats
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN games")
+    parser.add_argument("pgn", nargs="+")
+    parser.add_argument("output")
+    parser.add_argument("--max-ply", type=int, default=config.BOOK_MAX_PLY)
+    parser.add_argument("--min-weight", type=int, default=1, help="leave out moves played fewer times")
+    args = parser.parse_args(argv)
+
+    stats = build_book(pgn_paths=args.pgn, output=args.output, max_ply=args.max_ply, min_weight=args.min_weight)
+    print(stats, file=sys.stderr)
+
+    book = OpeningBook(args.output)
+    game = Game()
+    start = time.perf_counter()
+    moves = book.get_moves(game)
+    seconds = time.perf_counter() - start
+    print(f"{len(book)} entries, {len(moves)} moves from the starting position, lookup took {seconds * 1e6:.0f}us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,38 @@
-import subprocess
+import threading
 import tkinter as tk
-from typing import List, Type
+from typing import List, Optional, Type
 import sys
-import numpy as np
 import os
 import config
-import constants
-from pieces import Piece
-from utils import calculate_board_coordinates_from_canvas, calculate_canvas_coordinates_from_board
-
-import platform
-
-if platform.system() == "Windows":
-    import winsound
+from audio import AudioWorker, create_backend
+from bitboard import square
+from book import open_book
+from engine import Engine, SearchResult
+from game import Game
+from instrumentation import PeriodicLog, format_snapshot, profiler, registry, timed, write_snapshot
+from moves import POSITIONS, get_to_square
+from sprites import BoardRenderer
+from tablebase import open_tablebases
+from utils import calculate_board_coordinates_from_canvas
+from worker import BackgroundWorker
 
 
 class Chess:
-    def __init__(self, windows: bool):
+    def __init__(self, windows: bool, game: Game = None, computer_color: Optional[str] = config.COMPUTER_COLOR):
+        if computer_color not in ["white", "black", None]:
+            raise ValueError(f"Computer can play white, black or None, not {computer_color}")
         self.windows = windows
+        self.game = game if game is not None else Game()
+        self.computer_color = computer_color
+        self.engine = None
+        if computer_color:
+            self.engine = Engine(book=open_book(config.BOOK_PATH), tablebases=open_tablebases(config.TABLEBASE_PATH))
         self.tk_root = tk.Tk()
+        self.worker = BackgroundWorker(tk_root=self.tk_root)
+        self.audio = AudioWorker(backend=create_backend(config.AUDIO_BACKEND))
+        self.instrumentation_log = None
+        self.is_computer_thinking = False
+        self.search_stop_event = threading.Event()
         self.tk_root.title(config.GAME_TITLE)
         self.canvas = tk.Canvas(height=config.BOARD_SIZE, width=config.BOARD_SIZE)
         self.selected_item = {
@@ -29,62 +43,36 @@ class Chess:
             "item_turn": False,
         }
         self.is_selected = False
-        self.board = np.ndarray(shape=(8, 8), dtype=Piece)
-        self.pieces = {}
-        self.pieces_pos = config.PIECES
-        self.select_rect = None
-        self.white_turn = True
+        self.renderer = BoardRenderer(canvas=self.canvas)
         self.is_player_turn = True
-        self.possible_moves = []
-        self.possible_move_mark = []
+        self.possible_moves: List[int] = []
         self.selected_coordinates = {
             "board_x": Type[int],
             "board_y": Type[int],
             "canvas_x": Type[int],
             "canvas_y": Type[int],
         }
-        self.in_game = True
-        self.en_passant = []
 
     def run(self):
-        self.init_pieces()
-        self.get_all_possible_moves()
-        self.draw_board()
-        self.draw_pieces()
+        self.renderer.draw_board()
+        self.renderer.render(self.game.board)
         self.canvas.pack()
         self.canvas.bind("<Button-1>", self.on_click)
-
-    def init_pieces(self):
-        for piece, pos in self.pieces_pos.items():
-            self.pieces[piece] = Piece(piece=piece, canvas=self.canvas, pos=pos)
-
-    def draw_board(self):
-        for row_number, row in enumerate(self.board):
-            x = config.SQUARE_SIZE * row_number
-            for column_number, _ in enumerate(row):
-                if (row_number + column_number) % 2 == 0:
-                    fill = config.WHITE_SQUARE_COLOR
-                else:
-                    fill = config.DARK_SQUARE_COLOR
-
-                y = config.SQUARE_SIZE * column_number
-
-                self.canvas.create_rectangle(
-                    x,
-                    y,
-                    x + config.SQUARE_SIZE,
-                    y + config.SQUARE_SIZE,
-                    fill=fill,
-                    outline=fill,
-                )
-
-    def draw_pieces(self):
-        for _, piece in self.pieces.items():
-            piece.draw_piece()
-
+        self.tk_root.bind(config.PROFILE_HOTKEY, self.toggle_profiler)
+        self.tk_root.protocol("WM_DELETE_WINDOW", self.quit)
+        if config.PROFILE_SESSION:
+            profiler.start()
+        if config.INSTRUMENTATION and config.INSTRUMENTATION_LOG_SECONDS:
+            self.instrumentation_log = PeriodicLog(interval=config.INSTRUMENTATION_LOG_SECONDS, path=config.INSTRUMENTATION_PATH)
+        self.on_position_changed()
+
+    @timed()
     def on_click(self, event):
-        if self.in_game:
-            self.canvas.delete(self.select_rect)
+        if self.is_computer_thinking:
+            # A click while the computer thinks makes it play the best move it has found so far.
+            self.search_stop_event.set()
+        if self.game.in_game and self.is_player_turn:
+            self.renderer.hide_selection()
             (
                 self.selected_coordinates["board_x"],
                 self.selected_coordinates["board_y"],
@@ -94,23 +82,10 @@ class Chess:
             self.remove_possible_move_marks()
             piece_name = self.get_piece_from_position()
 
-            print("\n\n")
-            print("Clicked on:")
-            print(f"Piece {piece_name}:")
-            print(f"White turn {self.white_turn}")
-            print(f'board coordinates {self.selected_coordinates["board_x"], self.selected_coordinates["board_y"]}')
             if self.is_selected & self.selected_item["item_turn"] and len(self.possible_moves) > 0:
-                if [
-                    self.selected_coordinates["board_x"],
-                    self.selected_coordinates["board_y"],
-                ] in self.possible_moves:
-                    if piece_name:
-                        self.move_with_capture()
-                    elif [self.selected_coordinates["board_x"], self.selected_coordinates["board_y"]] == self.en_passant:
-                        self.en_passant_capture()
-                    else:
-                        self.move_piece()
-                        self.play_sound(sound="move")
+                target_sq = square([self.selected_coordinates["board_x"], self.selected_coordinates["board_y"]])
+                if any(get_to_square(move) == target_sq for move in self.possible_moves):
+                    self.move_piece()
                 else:
                     if piece_name:
                         self.select_piece(piece_name=piece_name)
@@ -125,189 +100,103 @@ class Chess:
                     self.create_select_rectangle()
                     self.is_selected = False
 
-    def get_all_possible_moves(self) -> List:
-        all_moves = []
-        for piece_name in self.pieces:
-            if self.pieces[piece_name].is_white == self.white_turn:
-                possible_moves = self.get_possible_moves_per_piece(piece_name=piece_name)
-                self.pieces[piece_name].possible_moves = possible_moves
-                if len(possible_moves) > 0:
-                    all_moves.append(possible_moves)
-        return all_moves
-
-    def get_possible_moves_per_piece(self, piece_name: str) -> List:
-        possible_moves = self.pieces[piece_name].calculate_possible_moves(pieces_pos=self.pieces_pos, en_passant=self.en_passant)
-        if len(possible_moves) > 0:
-            possible_moves = self.filter_illegal_moves(moves=possible_moves, piece_name=piece_name)
-        return possible_moves
-
-    def filter_illegal_moves(self, moves: List, piece_name: str) -> List:
-        original_position = self.pieces[piece_name].pos
-        if self.white_turn:
-            king_position = self.pieces_pos["K0"]
-        else:
-            king_position = self.pieces_pos["k0"]
-
-        legal_moves = []
-
-        for move in moves:
-            illegal_move = False
-            self.pieces[piece_name].pos = move
-            self.pieces_pos[piece_name] = move
-
-            if piece_name in ["k0", "K0"]:
-                king_position = move
-
-            for piece in self.pieces:
-                if self.pieces[piece].is_white != self.white_turn:
-                    possible_moves = self.pieces[piece].calculate_possible_moves(pieces_pos=self.pieces_pos)
-
-                    king_capture_moves = [
-                        possible_move
-                        for possible_move in possible_moves
-                        if possible_move == king_position and move != self.pieces[piece].pos
-                    ]
-                    if len(king_capture_moves) > 0:
-                        illegal_move = True
-                        break
-
-            if not illegal_move:
-                legal_moves.append(move)
-
-        self.pieces[piece_name].pos = original_position
-        self.pieces_pos[piece_name] = original_position
-
-        return legal_moves
-
     def remove_possible_move_marks(self):
-        if len(self.possible_move_mark):
-            for mark_to_delete in self.possible_move_mark:
-                self.canvas.delete(mark_to_delete)
-            self.possible_move_mark = []
+        self.renderer.hide_moves()
 
     def draw_possible_moves(self, piece_name):
-        self.possible_moves = self.pieces[piece_name].possible_moves
-
-        if len(self.possible_moves) > 0:
-            for x, y in self.possible_moves:
-                circle_x, circle_y = calculate_canvas_coordinates_from_board(x, y)
-                circle_x = circle_x + config.SQUARE_SIZE / 2
-                circle_y = circle_y + config.SQUARE_SIZE / 2
-                self.possible_move_mark.append(
-                    [
-                        self.canvas.create_oval(
-                            (
-                                circle_x - config.MOVE_MARK_SIZE_OFFSET,
-                                circle_y - config.MOVE_MARK_SIZE_OFFSET,
-                                circle_x + config.MOVE_MARK_SIZE_OFFSET,
-                                circle_y + config.MOVE_MARK_SIZE_OFFSET,
-                            ),
-                            fill=config.MOVE_MARK_COLOR,
-                            outline="",
-                        ),
-                    ]
-                )
-
-    def update_piece_position(self, piece_name: str, new_pos: List[int]):
-        self.pieces[piece_name].pos = new_pos
-        self.pieces_pos[piece_name] = new_pos
+        self.possible_moves = self.game.get_piece_legal_moves(piece_name)
+        self.renderer.show_moves([POSITIONS[get_to_square(move)] for move in self.possible_moves])
 
     def get_piece_from_position(self) -> str:
         pos = [
             self.selected_coordinates["board_x"],
             self.selected_coordinates["board_y"],
         ]
-        piece_name = [k for k, v in self.pieces_pos.items() if v == pos]
-        if len(piece_name) > 0:
-            piece_name = piece_name[0]
-        return piece_name
+        return self.game.get_piece_from_position(pos)
 
     def create_select_rectangle(self):
-        x = self.selected_coordinates["canvas_x"] - config.SQUARE_SIZE / 2
-        y = self.selected_coordinates["canvas_y"] - config.SQUARE_SIZE / 2
-        self.select_rect = self.canvas.create_rectangle(
-            x,
-            y,
-            x + config.SQUARE_SIZE,
-            y + config.SQUARE_SIZE,
-            outline=config.SELECT_COLOR,
-            width=config.SELECT_WIDTH,
-        )
+        self.renderer.show_selection([self.selected_coordinates["board_x"], self.selected_coordinates["board_y"]])
 
     def play_sound(self, sound):
-        if sound == "move":
-            if self.windows:
-                winsound.PlaySound(constants.SOUND_FOLDER + constants.SOUND_MOVE_FILE, winsound.SND_FILENAME)
-            else:
-                subprocess.Popen(["afplay", constants.SOUND_FOLDER + constants.SOUND_MOVE_FILE])
-
-        elif sound == "capture":
-            if self.windows:
-                winsound.PlaySound(constants.SOUND_FOLDER + constants.SOUND_CAPTURE_FILE, winsound.SND_FILENAME)
-            else:
-                subprocess.Popen(["afplay", constants.SOUND_FOLDER + constants.SOUND_CAPTURE_FILE])
-
-    def capture_piece(self):
-        piece_name = self.get_piece_from_position()
-        if piece_name:
-            self.pieces.pop(piece_name)
-            self.pieces_pos.pop(piece_name)
-            print(f"Piece {piece_name} was captured")
+        """Queues the sound on the audio worker and returns straight away."""
+        self.audio.play(sound)
 
     def move_piece(self):
-        old_canvas_x, old_canvas_y = self.selected_item["canvas_xy"]
-        piece = self.pieces[self.selected_item["piece"]]
-        if piece.piece.lower() == "p":
-            self.allow_en_passant()
-        else:
-            self.en_passant = []
-
-        piece.move_piece(
-            move_x=self.selected_coordinates["canvas_x"] - old_canvas_x,
-            move_y=self.selected_coordinates["canvas_y"] - old_canvas_y,
-        )
-        self.update_piece_position(
+        self.apply_move(
             piece_name=self.selected_item["piece"],
             new_pos=[
                 self.selected_coordinates["board_x"],
                 self.selected_coordinates["board_y"],
             ],
         )
+
+    def apply_move(self, piece_name: str, new_pos: List[int]):
+        record = self.game.make_move(piece_name=piece_name, new_pos=new_pos)
+        captured_piece = record.captured_name
+        touched_squares = [square(record.old_pos), square(record.new_pos)]
+        if captured_piece:
+            touched_squares.append(square(record.captured_piece.pos))
+            print(f"Piece {captured_piece} was captured")
+        self.renderer.render(self.game.board, squares=touched_squares)
         self.is_selected = False
-        self.white_turn = not self.white_turn
-        all_moves = self.get_all_possible_moves()
-        if len(all_moves) == 0:
-            self.show_winning_screen()
 
-    def allow_en_passant(self):
-        is_correct_rank = self.selected_coordinates["board_y"] in [3, 4]
-        if is_correct_rank:
-            was_moved_by_two = abs(self.selected_coordinates["board_y"] - self.selected_item["board_xy"][1]) == 2
-            if was_moved_by_two:
-                x = self.selected_coordinates["board_x"]
-                y = self.selected_coordinates["board_y"]
-                if self.white_turn:
-                    y = y + 1
-                else:
-                    y = y - 1
-                self.en_passant = [x, y]
+        if captured_piece:
+            self.play_sound(sound="capture")
         else:
-            self.en_passant = []
+            self.play_sound(sound="move")
 
-    def en_passant_capture(self):
-        board_y = self.selected_coordinates["board_y"]
-        if self.white_turn:
-            self.selected_coordinates["board_y"] = board_y + 1
-        else:
-            self.selected_coordinates["board_y"] = board_y - 1
-        self.capture_piece()
-        self.selected_coordinates["board_y"] = board_y
-        self.move_piece()
+        self.on_position_changed()
+
+    def on_position_changed(self):
+        """
+        Ends the game or passes the turn. This only looks for a single legal move, the moves of a piece are generated
+        when it's selected.
+        """
+        self.possible_moves = []
+        termination = self.game.get_termination()
+        if termination is not None:
+            self.show_winning_screen(termination)
+            return
+        self.update_turn()
+
+    def is_computer_turn(self) -> bool:
+        if self.computer_color is None:
+            return False
+        return (self.computer_color == "white") == self.game.white_turn
+
+    def update_turn(self):
+        self.is_player_turn = not self.is_computer_turn()
+        if not self.is_player_turn:
+            self.start_computer_move()
+
+    def start_computer_move(self):
+        self.is_computer_thinking = True
+        self.search_stop_event = threading.Event()
+        snapshot = self.game.copy()
+        stop_event = self.search_stop_event
+        self.worker.submit(
+            function=lambda cancel_event: self.engine.search(snapshot, stop_event=stop_event, cancel_event=cancel_event),
+            on_done=self.on_computer_move,
+            on_error=self.on_computer_error,
+        )
 
-    def move_with_capture(self):
-        self.capture_piece()
-        self.move_piece()
-        self.play_sound(sound="capture")
+    def on_computer_move(self, result: SearchResult):
+        self.is_computer_thinking = False
+        if config.INSTRUMENTATION:
+            registry.record("Engine.search", result.seconds)
+            if result.depth > 0:
+                # Book and tablebase moves are answered without searching.
+                registry.observe("Engine.search.depth", result.depth)
+                registry.observe("Engine.search.nodes", result.nodes)
+                registry.observe("Engine.search.nps", result.nps)
+        if result.move is not None:
+            piece_name, new_pos = result.move
+            self.apply_move(piece_name=piece_name, new_pos=new_pos)
+
+    def on_computer_error(self, error: BaseException):
+        # The worker printed the traceback. Hand the move to the player, the computer tries again on its next turn.
+        self.is_computer_thinking = False
+        self.is_player_turn = True
 
     def select_piece(self, piece_name):
         self.create_select_rectangle()
@@ -320,24 +209,44 @@ class Chess:
             self.selected_coordinates["board_y"],
         ]
         self.selected_item["piece"] = piece_name
-        self.selected_item["item_turn"] = piece_name.isupper() == self.white_turn
+        self.selected_item["item_turn"] = piece_name.isupper() == self.game.white_turn
         self.is_selected = True
 
-    def show_winning_screen(self):
-        self.in_game = False
-        if self.white_turn:
-            winning_color = "Black"
+    def show_winning_screen(self, termination: str):
+        self.game.in_game = False
+        if termination == "checkmate":
+            winning_color = "Black" if self.game.white_turn else "White"
+            self.renderer.show_message(f"{winning_color} won")
         else:
-            winning_color = "White"
-        self.canvas.delete("all")
-        self.canvas.create_text(
-            (config.BOARD_SIZE / 2, config.BOARD_SIZE / 2), text=f"{winning_color} won", anchor="center", font="Helvetica 18 bold"
-        )
+            self.renderer.show_message(f"Draw by {termination}")
+
+    def toggle_profiler(self, event=None):
+        """Starts cProfile, or stops it, writes config.PROFILE_PATH and prints the slowest functions."""
+        if profiler.active:
+            print(profiler.stop())
+        else:
+            print(f"Profiling until {config.PROFILE_HOTKEY} is pressed again")
+            profiler.start()
+
+    def write_instrumentation(self):
+        if self.instrumentation_log is not None:
+            self.instrumentation_log.stop()
+        if profiler.active:
+            print(profiler.stop())
+        if config.INSTRUMENTATION:
+            print(format_snapshot())
+            write_snapshot(config.INSTRUMENTATION_PATH)
 
     def restart(self):
+        self.write_instrumentation()
+        self.worker.stop()
+        self.audio.stop()
         self.tk_root.destroy()
         os.startfile("main.py")
 
     def quit(self):
+        self.write_instrumentation()
+        self.worker.stop()
+        self.audio.stop()
         self.tk_root.destroy()
         sys.exit(0)
@@ -0,0 +1,194 @@
+"""
+Client for server.py: an interactive test client and a synthetic load generator.
+
+    python client.py play                     play both sides by typing moves like e2e4
+    python client.py load --games 2000 --connections 50 --plies 40
+    python client.py load --unix /tmp/chess.sock --output load.json
+
+The load generator plays random legal moves in many concurrent games, spread over the connections with several
+requests in flight per connection, and reports move throughput and the latency percentiles of the move requests.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+
+
+class GameClient:
+    """One connection to the server. Requests can be sent concurrently, responses are matched by their id."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.read_task = asyncio.create_task(self.read_responses())
+
+    @classmethod
+    async def connect(
+        cls, host: str = config.SERVER_HOST, port: int = config.SERVER_PORT, unix_path: Optional[str] = None
+    ) -> "GameClient":
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(path=unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host=host, port=port)
+        return cls(reader, writer)
+
+    async def read_responses(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def request(self, op: str, **fields) -> Dict[str, Any]:
+        """Response of the server, raises ValueError with the server's message when the request failed."""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(json.dumps({"id": request_id, "op": op, **fields}).encode() + b"\n")
+        await self.writer.drain()
+        response = await future
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.read_task.cancel()
+
+
+async def play(client: GameClient, fen: Optional[str]):
+    loop = asyncio.get_running_loop()
+    state = await client.request("new", **({"fen": fen} if fen else {}))
+    game_id = state["game"]
+    while state["status"] == "playing":
+        print(state["fen"])
+        print("Legal moves: " + " ".join(state["moves"]))
+        move = (await loop.run_in_executor(None, input, "Move: ")).strip()
+        if move in ["quit", "exit", ""]:
+            break
+        try:
+            state = await client.request("move", game=game_id, move=move)
+        except ValueError as error:
+            print(error)
+            continue
+        if state["captured"]:
+            print(f"Captured {state['captured']}")
+    print(f"{state['fen']} {state['status']}")
+    await client.request("close", game=game_id)
+
+
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def play_random_game(client: GameClient, plies: int, rng: random.Random, latencies: List[float]):
+    state = await client.request("new")
+    game_id = state["game"]
+    for _ in range(plies):
+        if state["status"] != "playing":
+            break
+        start = time.perf_counter()
+        state = await client.request("move", game=game_id, move=rng.choice(state["moves"]))
+        latencies.append(time.perf_counter() - start)
+    await client.request("close", game=game_id)
+
+
+async def run_load(
+    games: int, connections: int, plies: int, seed: int, host: str, port: int, unix_path: Optional[str]
+) -> Dict[str, Any]:
+    clients = [await GameClient.connect(host=host, port=port, unix_path=unix_path) for _ in range(connections)]
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[play_random_game(clients[index % connections], plies, random.Random(rng.random()), latencies) for index in range(games)]
+    )
+    seconds = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    return {
+        "games": games,
+        "connections": connections,
+        "moves": len(latencies),
+        "seconds": seconds,
+        "moves_per_second": len(latencies) / seconds if seconds > 0 else 0.0,
+        "p50_ms": get_percentile(latencies, 50) * 1e3,
+        "p90_ms": get_percentile(latencies, 90) * 1e3,
+        "p99_ms": get_percentile(latencies, 99) * 1e3,
+        "max_ms": latencies[-1] * 1e3 if latencies else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace):
+    if args.command == "play":
+        client = await GameClient.connect(host=args.host, port=args.port, unix_path=args.unix)
+        await play(client, fen=args.fen)
+        await client.close()
+        return
+
+    result = await run_load(
+        games=args.games,
+        connections=args.connections,
+        plies=args.plies,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+        unix_path=args.unix,
+    )
+    print(
+        f"{result['games']} games, {result['moves']} moves in {result['seconds']:.2f}s: "
+        f"{result['moves_per_second']:.0f} moves/s, p50 {result['p50_ms']:.2f} ms, p90 {result['p90_ms']:.2f} ms, "
+        f"p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test client and load generator for server.py.")
+    parser.add_argument("command", choices=["play", "load"])
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--unix", help="Connect to this Unix socket instead of TCP")
+    parser.add_argument("--fen", help="Start the played game from this position")
+    parser.add_argument("--games", type=int, default=1000, help="Concurrent games of the load generator")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--plies", type=int, default=40, help="Moves per generated game at most")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the load results to this JSON file")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except (ConnectionError, OSError) as error:
+        print(f"Couldn't talk to the server: {error}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
+import os
+
 import numpy as np
 
 PIECE_TYPES = ["p", "r", "n", "b", "q", "k", "P", "R", "N", "B", "Q", "K"]
+MOVE_GENERATORS = ["list", "bitboard"]
+MOVE_GENERATOR = "bitboard"
+DEBUG_ZOBRIST = False
 PIECES = {
     "r0": [0, 0],
     "n0": [1, 0],
@@ -60,3 +65,35 @@ MOVE_MARK_COLOR = "#7770d2"
 MOVE_MARK_SIZE_OFFSET = 5
 
 GAME_TITLE = "Chess"
+
+# "white", "black" or None for two human players
+COMPUTER_COLOR = "black"
+COMPUTER_MOVE_DELAY_MS = 50
+ENGINE_TIME_LIMIT = 1.5
+ENGINE_NODE_LIMIT = None
+ENGINE_MAX_DEPTH = 32
+ENGINE_TABLE_SIZE = 1000000
+WORKER_POLL_MS = 5
+# Next to this file, so the GUI and tools started from another directory still find the book, the tablebases and the
+# cached attack tables
+RESOURCES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+BOOK_PATH = os.path.join(RESOURCES_PATH, "book.bin")
+BOOK_MAX_PLY = 20
+TABLEBASE_PATH = os.path.join(RESOURCES_PATH, "tablebases")
+ATTACK_TABLES_PATH = os.path.join(RESOURCES_PATH, "attack_tables.bin")
+# "auto", "winsound", "command", "null" or "recording", see audio.py
+AUDIO_BACKEND = "auto"
+
+# Timers and histograms of the hot paths, see instrumentation.py
+INSTRUMENTATION = os.environ.get("CHESS_INSTRUMENTATION", "") not in ["", "0"]
+INSTRUMENTATION_PATH = "./instrumentation.json"
+INSTRUMENTATION_LOG_SECONDS = None
+# Setting CHESS_PROFILE profiles the whole session into that file, otherwise the hotkey starts and stops cProfile
+PROFILE_SESSION = "CHESS_PROFILE" in os.environ
+PROFILE_PATH = os.environ.get("CHESS_PROFILE", "./chess.prof")
+PROFILE_HOTKEY = "<F9>"
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_GAMES = 10000
+# Threads validating moves for server.py, None lets ThreadPoolExecutor choose
+SERVER_WORKERS = None
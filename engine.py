@@ -0,0 +1,275 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+import evaluation
+from book import OpeningBook
+from evaluation import PIECE_VALUES
+from game import Game
+from moves import CAPTURE, FLAGS_SHIFT, FROM_MASK, TO_SHIFT, MoveBuffers
+from tablebase import MAX_PIECES, ProbeResult, Tablebases
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = 1000000
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+BUDGET_CHECK_INTERVAL = 128
+
+Move = Tuple[str, List[int]]
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    def __init__(self, move: Optional[Move], score: int, depth: int, nodes: int, seconds: float):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"SearchResult(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes}, nps={self.nps:.0f})"
+
+
+class TableEntry:
+    __slots__ = ("depth", "score", "flag", "move")
+
+    def __init__(self, depth: int, score: int, flag: int, move: Optional[int]):
+        self.depth = depth
+        self.score = score
+        self.flag = flag
+        self.move = move
+
+
+class Engine:
+    """Negamax alpha-beta with iterative deepening, capture quiescence and a transposition table keyed by Zobrist key."""
+
+    def __init__(
+        self,
+        time_limit: float = config.ENGINE_TIME_LIMIT,
+        node_limit: Optional[int] = config.ENGINE_NODE_LIMIT,
+        max_depth: int = config.ENGINE_MAX_DEPTH,
+        table_size: int = config.ENGINE_TABLE_SIZE,
+        book: Optional[OpeningBook] = None,
+        tablebases: Optional[Tablebases] = None,
+    ):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.book = book
+        self.tablebases = tablebases
+        self.transposition_table: Dict[int, TableEntry] = {}
+        self.nodes = 0
+        self.deadline = 0.0
+        self.stop_event: Optional[threading.Event] = None
+        self.cancel_event: Optional[threading.Event] = None
+        self.buffers = MoveBuffers()
+
+    def search(
+        self, game: Game, stop_event: Optional[threading.Event] = None, cancel_event: Optional[threading.Event] = None
+    ) -> SearchResult:
+        """
+        Best move for the side to move within the time and node budget. The game is left as it was.
+        Setting stop_event ends the search early with the best move of the last finished iteration.
+        Setting cancel_event ends it the same way, for callers that are going to drop the result.
+        Positions in the opening book or the endgame tablebases are answered from them without searching.
+        """
+        start = time.perf_counter()
+        if self.book is not None:
+            book_move = self.book.choose_move(game)
+            if book_move is not None:
+                return SearchResult(move=book_move, score=0, depth=0, nodes=0, seconds=time.perf_counter() - start)
+        if self.tablebases is not None and len(game.pieces_pos) <= MAX_PIECES:
+            tablebase_move = self.tablebases.best_move(game)
+            if tablebase_move is not None:
+                move, result = tablebase_move
+                score = self.get_tablebase_score(result, ply=0)
+                return SearchResult(move=move, score=score, depth=0, nodes=0, seconds=time.perf_counter() - start)
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        self.stop_event = stop_event
+        self.cancel_event = cancel_event
+        if len(self.transposition_table) > self.table_size:
+            self.transposition_table.clear()
+
+        root_moves = game.generate_moves().to_list()
+        best = SearchResult(move=game.decode_move(root_moves[0]) if root_moves else None, score=0, depth=0, nodes=0, seconds=0.0)
+        if len(root_moves) <= 1:
+            best.seconds = time.perf_counter() - start
+            return best
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self.search_root(game=game, moves=root_moves, depth=depth)
+            except SearchTimeout:
+                break
+            best = SearchResult(
+                move=game.decode_move(move), score=score, depth=depth, nodes=self.nodes, seconds=time.perf_counter() - start
+            )
+            if abs(score) >= MATE_THRESHOLD:
+                break
+
+        best.nodes = self.nodes
+        best.seconds = time.perf_counter() - start
+        return best
+
+    def search_root(self, game: Game, moves: List[int], depth: int) -> Tuple[int, int]:
+        alpha = -INFINITY
+        best_move = moves[0]
+        entry = self.transposition_table.get(game.zobrist_key)
+        for move in self.order_moves(game=game, moves=moves, table_move=entry.move if entry else None):
+            game.make_encoded_move(move)
+            try:
+                score = -self.negamax(game=game, depth=depth - 1, alpha=-INFINITY, beta=-alpha, ply=1)
+            finally:
+                game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.transposition_table[game.zobrist_key] = TableEntry(depth=depth, score=alpha, flag=EXACT, move=best_move)
+        return alpha, best_move
+
+    def negamax(self, game: Game, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.count_node()
+        # A position repeated inside the search could be repeated forever, so it already counts as a draw.
+        if game.get_repetition_count() >= 2 or game.halfmove_clock >= 100:
+            return 0
+        if depth <= 0:
+            return self.quiescence(game=game, alpha=alpha, beta=beta, ply=ply)
+
+        if self.tablebases is not None and len(game.pieces_pos) <= MAX_PIECES:
+            result = self.tablebases.probe(game)
+            if result is not None:
+                return self.get_tablebase_score(result, ply=ply)
+
+        original_alpha = alpha
+        entry = self.transposition_table.get(game.zobrist_key)
+        if entry is not None and entry.depth >= depth:
+            score = self.score_from_table(entry.score, ply)
+            if entry.flag == EXACT:
+                return score
+            elif entry.flag == LOWER_BOUND:
+                alpha = max(alpha, score)
+            elif entry.flag == UPPER_BOUND:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        moves = game.generate_moves(self.buffers[ply])
+        if moves.count == 0:
+            if game.get_check_info().checkers:
+                return -MATE_SCORE + ply
+            return 0
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(game=game, moves=moves, table_move=entry.move if entry else None):
+            game.make_encoded_move(move)
+            try:
+                score = -self.negamax(game=game, depth=depth - 1, alpha=-beta, beta=-alpha, ply=ply + 1)
+            finally:
+                game.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.transposition_table[game.zobrist_key] = TableEntry(
+            depth=depth, score=self.score_to_table(best_score, ply), flag=flag, move=best_move
+        )
+        return best_score
+
+    def quiescence(self, game: Game, alpha: int, beta: int, ply: int) -> int:
+        stand_pat = self.evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        captures = [move for move in game.generate_moves(self.buffers[ply]) if move >> FLAGS_SHIFT & CAPTURE]
+        for move in self.order_moves(game=game, moves=captures, table_move=None):
+            self.count_node()
+            game.make_encoded_move(move)
+            try:
+                score = -self.quiescence(game=game, alpha=-beta, beta=-alpha, ply=ply + 1)
+            finally:
+                game.unmake_move()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def evaluate(self, game: Game) -> int:
+        """Static evaluation from the point of view of the side to move."""
+        score = evaluation.evaluate(game)
+        return score if game.white_turn else -score
+
+    @staticmethod
+    def get_tablebase_score(result: ProbeResult, ply: int) -> int:
+        if result.wdl > 0:
+            return MATE_SCORE - ply - result.plies
+        if result.wdl < 0:
+            return -MATE_SCORE + ply + result.plies
+        return 0
+
+    def order_moves(self, game: Game, moves: Iterable[int], table_move: Optional[int]) -> List[int]:
+        """Table move first, then captures by most valuable victim and least valuable attacker, then the rest."""
+        board = game.board
+
+        def move_order(move: int) -> int:
+            if move == table_move:
+                return -INFINITY
+            victim = board[move >> TO_SHIFT & FROM_MASK]
+            if victim is not None:
+                return -10 * PIECE_VALUES[victim[0].lower()] + PIECE_VALUES[board[move & FROM_MASK][0].lower()]
+            return 0
+
+        return sorted(moves, key=move_order)
+
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes % BUDGET_CHECK_INTERVAL == 0:
+            if time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchTimeout()
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+
+    @staticmethod
+    def score_to_table(score: int, ply: int) -> int:
+        if score >= MATE_THRESHOLD:
+            return score + ply
+        if score <= -MATE_THRESHOLD:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score: int, ply: int) -> int:
+        if score >= MATE_THRESHOLD:
+            return score - ply
+        if score <= -MATE_THRESHOLD:
+            return score + ply
+        return score
@@ -0,0 +1,194 @@
+"""
+Static evaluation in centipawns from white's side: material, piece-square tables, mobility and basic king safety.
+
+Material and piece-square values only depend on where each piece stands, so Game keeps their sum incrementally in
+piece_square_score, like the Zobrist key. Mobility and king safety depend on the whole position and are computed from
+the bitboards when evaluating. batch.evaluate scores arrays of positions the same way.
+"""
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from attack_tables import FULL, KING_ATTACKS, KNIGHT_ATTACKS, NOT_FILE_A, NOT_FILE_H, bishop_attacks_from, rook_attacks_from
+from bitboard import Bitboards, pawn_attacks, square
+
+if TYPE_CHECKING:
+    # game imports this module, so Game is only imported for annotations.
+    from game import Game
+
+PIECE_VALUES = {"p": 100, "n": 320, "b": 330, "r": 500, "q": 900, "k": 0}
+
+# Bonuses of white pieces indexed [y][x] like the positions in config.PIECES, so y = 0 is black's back rank.
+# Black pieces use the table mirrored vertically.
+PIECE_SQUARE_TABLES = {
+    "p": [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "n": [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ],
+    "b": [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 10, 10, 5, 0, -10],
+        [-10, 5, 5, 10, 10, 5, 5, -10],
+        [-10, 0, 10, 10, 10, 10, 0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10, 5, 0, 0, 0, 0, 5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+    ],
+    "r": [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 10, 10, 10, 10, 10, 10, 5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [0, 0, 0, 5, 5, 0, 0, 0],
+    ],
+    "q": [
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 5, 5, 5, 0, -10],
+        [-5, 0, 5, 5, 5, 5, 0, -5],
+        [0, 0, 5, 5, 5, 5, 0, -5],
+        [-10, 5, 5, 5, 5, 5, 0, -10],
+        [-10, 0, 5, 0, 0, 0, 0, -10],
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+    ],
+    "k": [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [20, 20, 0, 0, 0, 0, 20, 20],
+        [20, 30, 10, 0, 0, 10, 30, 20],
+    ],
+}
+
+# Centipawns per square a piece attacks that isn't taken by a piece of its own color.
+MOBILITY_WEIGHTS = {"n": 4, "b": 5, "r": 2, "q": 1}
+# Per own pawn on the three squares in front of the king and on the three squares in front of those.
+PAWN_SHIELD_WEIGHTS = [10, 5]
+# Per square around the king, the king's square included, attacked by the opponent's pawns and pieces.
+KING_ZONE_ATTACK_WEIGHT = 8
+
+
+def build_piece_square_values() -> Dict[str, List[int]]:
+    """Material plus piece-square bonus of every piece on every square, negative for black pieces."""
+    values = {}
+    for piece_type, table in PIECE_SQUARE_TABLES.items():
+        values[piece_type.upper()] = [PIECE_VALUES[piece_type] + table[sq >> 3][sq & 7] for sq in range(64)]
+        values[piece_type] = [-PIECE_VALUES[piece_type] - table[7 - (sq >> 3)][sq & 7] for sq in range(64)]
+    return values
+
+
+PIECE_SQUARE_VALUES = build_piece_square_values()
+
+
+def get_piece_square_value(piece: str, pos: List[int]) -> int:
+    return PIECE_SQUARE_VALUES[piece][square(pos)]
+
+
+def calculate_piece_square_score(pieces_pos: Dict[str, List[int]]) -> int:
+    """Material and piece-square score of a position computed from scratch."""
+    return sum(get_piece_square_value(piece_name[0], pos) for piece_name, pos in pieces_pos.items())
+
+
+def build_pawn_shields(is_white: bool) -> List[List[int]]:
+    """For every king square, the three squares in front of it and the three in front of those, towards the opponent."""
+    shields = []
+    for sq in range(64):
+        front = 1 << sq
+        square_shields = []
+        for _ in PAWN_SHIELD_WEIGHTS:
+            front = front >> 8 if is_white else (front << 8) & FULL
+            front |= ((front << 1) & NOT_FILE_A & FULL) | ((front >> 1) & NOT_FILE_H)
+            square_shields.append(front)
+        shields.append(square_shields)
+    return shields
+
+
+PAWN_SHIELDS = {True: build_pawn_shields(is_white=True), False: build_pawn_shields(is_white=False)}
+KING_ZONES = [KING_ATTACKS[sq] | 1 << sq for sq in range(64)]
+
+
+def get_mobility(bitboards: Bitboards, is_white: bool, occupied: int) -> Tuple[int, int]:
+    """Mobility score of one side and every square its pawns and pieces attack."""
+    if is_white:
+        pawns, knights, bishops, rooks, queens = [bitboards.pieces[piece] for piece in "PNBRQ"]
+        not_own = FULL ^ bitboards.white
+    else:
+        pawns, knights, bishops, rooks, queens = [bitboards.pieces[piece] for piece in "pnbrq"]
+        not_own = FULL ^ bitboards.black
+    attacked = pawn_attacks(pawns, is_white)
+    mobility = 0
+    while knights:
+        lsb = knights & -knights
+        attacks = KNIGHT_ATTACKS[lsb.bit_length() - 1]
+        attacked |= attacks
+        mobility += MOBILITY_WEIGHTS["n"] * bin(attacks & not_own).count("1")
+        knights ^= lsb
+    while bishops:
+        lsb = bishops & -bishops
+        attacks = bishop_attacks_from(lsb.bit_length() - 1, occupied)
+        attacked |= attacks
+        mobility += MOBILITY_WEIGHTS["b"] * bin(attacks & not_own).count("1")
+        bishops ^= lsb
+    while rooks:
+        lsb = rooks & -rooks
+        attacks = rook_attacks_from(lsb.bit_length() - 1, occupied)
+        attacked |= attacks
+        mobility += MOBILITY_WEIGHTS["r"] * bin(attacks & not_own).count("1")
+        rooks ^= lsb
+    while queens:
+        lsb = queens & -queens
+        sq = lsb.bit_length() - 1
+        attacks = rook_attacks_from(sq, occupied) | bishop_attacks_from(sq, occupied)
+        attacked |= attacks
+        mobility += MOBILITY_WEIGHTS["q"] * bin(attacks & not_own).count("1")
+        queens ^= lsb
+    return mobility, attacked
+
+
+def get_king_safety(bitboards: Bitboards, is_white: bool, opponent_attacked: int) -> int:
+    """Bonus for the pawn shield of one side's king minus the penalty for attacked squares around it."""
+    king = bitboards.pieces["K" if is_white else "k"]
+    if not king:
+        return 0
+    pawns = bitboards.pieces["P" if is_white else "p"]
+    king_sq = king.bit_length() - 1
+    safety = -KING_ZONE_ATTACK_WEIGHT * bin(KING_ZONES[king_sq] & opponent_attacked).count("1")
+    for weight, shield in zip(PAWN_SHIELD_WEIGHTS, PAWN_SHIELDS[is_white][king_sq]):
+        safety += weight * bin(shield & pawns).count("1")
+    return safety
+
+
+def get_positional_score(bitboards: Bitboards) -> int:
+    """Mobility and king safety from white's side."""
+    occupied = bitboards.white | bitboards.black
+    white_mobility, white_attacked = get_mobility(bitboards, is_white=True, occupied=occupied)
+    black_mobility, black_attacked = get_mobility(bitboards, is_white=False, occupied=occupied)
+    white_safety = get_king_safety(bitboards, is_white=True, opponent_attacked=black_attacked)
+    black_safety = get_king_safety(bitboards, is_white=False, opponent_attacked=white_attacked)
+    return white_mobility - black_mobility + white_safety - black_safety
+
+
+def evaluate(game: "Game") -> int:
+    """Score of the position from white's side, positive when white is better."""
+    return game.piece_square_score + get_positional_score(game.bitboards)
@@ -0,0 +1,97 @@
+from typing import Dict, List
+
+import config
+from game import Game
+from utils import get_pos_from_square_name, get_square_name
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1"
+
+
+def parse_fen(fen: str, move_generator: str = config.MOVE_GENERATOR) -> Game:
+    """
+    Builds a Game from a FEN string. Castling rights are ignored because castling isn't implemented.
+    Pieces are named like in config.PIECES, numbered per piece letter in the order they appear.
+    Raises ValueError for malformed FENs and for positions where the side not to move is in check.
+    """
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError(f"Invalid FEN {fen}")
+    rows = fields[0].split("/")
+    if len(rows) != 8:
+        raise ValueError(f"Invalid FEN {fen}")
+
+    pieces_pos: Dict[str, List[int]] = {}
+    piece_counts: Dict[str, int] = {}
+    for y, row in enumerate(rows):
+        x = 0
+        for char in row:
+            if char.isdigit():
+                x += int(char)
+            elif char in config.PIECE_TYPES:
+                index = piece_counts.get(char, 0)
+                piece_counts[char] = index + 1
+                pieces_pos[f"{char}{index}"] = [x, y]
+                x += 1
+            else:
+                raise ValueError(f"Invalid piece {char} in FEN {fen}")
+        if x != 8:
+            raise ValueError(f"Invalid FEN {fen}")
+    if piece_counts.get("K") != 1 or piece_counts.get("k") != 1:
+        raise ValueError(f"FEN needs exactly one king per side: {fen}")
+
+    if fields[1] not in ["w", "b"]:
+        raise ValueError(f"Invalid side to move in FEN {fen}")
+
+    en_passant = []
+    if len(fields) > 3 and fields[3] != "-":
+        # The square skipped by the pawn that just moved, on the sixth rank when white is to move.
+        en_passant_rank = "6" if fields[1] == "w" else "3"
+        if len(fields[3]) != 2 or fields[3][0] not in "abcdefgh" or fields[3][1] != en_passant_rank:
+            raise ValueError(f"Invalid en passant square in FEN {fen}")
+        en_passant = get_pos_from_square_name(fields[3])
+
+    halfmove_clock, fullmove_number = 0, 1
+    if len(fields) > 5:
+        if not fields[4].isdigit() or not fields[5].isdigit():
+            raise ValueError(f"Invalid move counters in FEN {fen}")
+        halfmove_clock, fullmove_number = int(fields[4]), max(1, int(fields[5]))
+
+    game = Game(
+        pieces_pos=pieces_pos,
+        white_turn=fields[1] == "w",
+        en_passant=en_passant,
+        move_generator=move_generator,
+        halfmove_clock=halfmove_clock,
+        fullmove_number=fullmove_number,
+    )
+    # The side to move could capture the king, which no legal game reaches and which the move generators can't handle.
+    king = game.bitboards.pieces["k" if game.white_turn else "K"]
+    if game.bitboards.get_attackers(king.bit_length() - 1, by_white=game.white_turn, occupied=game.bitboards.occupied):
+        raise ValueError(f"Side not to move is in check: {fen}")
+    return game
+
+
+def get_fen(game: Game) -> str:
+    board = [[None] * 8 for _ in range(8)]
+    for piece_name, (x, y) in game.pieces_pos.items():
+        board[y][x] = piece_name[0]
+
+    rows = []
+    for row in board:
+        fen_row = ""
+        empty = 0
+        for piece in row:
+            if piece is None:
+                empty += 1
+            else:
+                if empty:
+                    fen_row += str(empty)
+                    empty = 0
+                fen_row += piece
+        if empty:
+            fen_row += str(empty)
+        rows.append(fen_row)
+
+    side = "w" if game.white_turn else "b"
+    en_passant = get_square_name(game.en_passant) if game.en_passant else "-"
+    return f"{'/'.join(rows)} {side} - {en_passant} {game.halfmove_clock} {game.fullmove_number}"
@@ -0,0 +1,377 @@
+import copy
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import config
+import evaluation
+import zobrist
+from bitboard import Bitboards, CheckInfo, square
+from instrumentation import timed
+from moves import CAPTURE, DOUBLE_PUSH, EN_PASSANT, FROM_MASK, POSITIONS, TO_SHIFT, MoveBuffer, encode_move
+from pieces import Piece
+
+
+class MoveRecord(NamedTuple):
+    """Everything unmake_move needs to restore the position before a move."""
+
+    piece_name: str
+    old_pos: List[int]
+    new_pos: List[int]
+    captured_name: Optional[str]
+    captured_piece: Optional[Piece]
+    en_passant: List
+    zobrist_key: int
+    check_info: Optional[CheckInfo]
+    in_game: bool
+    halfmove_clock: int
+
+
+class Game:
+    """Headless game state and rules. Holds no reference to Tk, so it can be used without a display."""
+
+    def __init__(
+        self,
+        pieces_pos: Optional[Dict[str, List[int]]] = None,
+        white_turn: bool = True,
+        en_passant: List = None,
+        move_generator: str = config.MOVE_GENERATOR,
+        debug_zobrist: bool = config.DEBUG_ZOBRIST,
+        halfmove_clock: int = 0,
+        fullmove_number: int = 1,
+    ):
+        if pieces_pos is None:
+            pieces_pos = config.PIECES
+        if move_generator not in config.MOVE_GENERATORS:
+            raise ValueError(f"Unknown move generator {move_generator}")
+        self.move_generator = move_generator
+        self.pieces = {}
+        self.pieces_pos = {piece_name: list(pos) for piece_name, pos in pieces_pos.items()}
+        self.white_turn = white_turn
+        self.en_passant = list(en_passant) if en_passant else []
+        self.in_game = True
+        self.board: List[Optional[str]] = [None] * 64
+        self.init_pieces()
+        self.bitboards = Bitboards.from_pieces_pos(self.pieces_pos)
+        self.check_info = None
+        self.debug_zobrist = debug_zobrist
+        self.zobrist_key = zobrist.calculate_key(self.pieces_pos, self.white_turn, self.en_passant)
+        # Material and piece-square score from white's side, updated with every piece that moves, leaves or comes back.
+        self.piece_square_score = evaluation.calculate_piece_square_score(self.pieces_pos)
+        self.move_stack: List[MoveRecord] = []
+        # Plies since the last capture or pawn move, and how often each Zobrist key occurred in this game.
+        self.halfmove_clock = halfmove_clock
+        self.start_fullmove_number = fullmove_number
+        self.start_white_turn = white_turn
+        self.position_counts: Dict[int, int] = {self.zobrist_key: 1}
+        # Encoded legal moves by piece name, filled when a piece asks for them and cleared when the position changes.
+        self.piece_moves: Dict[str, List[int]] = {}
+
+    def init_pieces(self):
+        for piece, pos in self.pieces_pos.items():
+            self.pieces[piece] = Piece(piece=piece, pos=pos)
+            self.board[square(pos)] = piece
+
+    def copy(self) -> "Game":
+        return copy.deepcopy(self)
+
+    @timed()
+    def calculate_possible_moves(self, piece_name: str, en_passant: List = []) -> List:
+        """Pseudo-legal moves of a piece from the selected move generator."""
+        piece = self.pieces[piece_name]
+        if self.move_generator == "bitboard":
+            return self.bitboards.calculate_possible_moves(piece=piece.piece, pos=piece.pos, en_passant=en_passant)
+        return piece.calculate_possible_moves(board=self.board, en_passant=en_passant)
+
+    @timed()
+    def get_all_possible_moves(self) -> List:
+        all_moves = []
+        for piece_name in self.pieces:
+            if self.pieces[piece_name].is_white == self.white_turn:
+                possible_moves = self.get_possible_moves_per_piece(piece_name=piece_name)
+                if len(possible_moves) > 0:
+                    all_moves.append(possible_moves)
+        return all_moves
+
+    def get_legal_moves(self) -> List[Tuple[str, List[int]]]:
+        """All legal moves of the side to move as (piece name, target position) pairs."""
+        return [self.decode_move(move) for move in self.generate_moves()]
+
+    @timed()
+    def generate_moves(self, buffer: Optional[MoveBuffer] = None) -> MoveBuffer:
+        """Encoded legal moves of the side to move, written into buffer if given so the caller can reuse it."""
+        if buffer is None:
+            buffer = MoveBuffer()
+        if self.move_generator == "bitboard":
+            en_passant_sq = square(self.en_passant) if self.en_passant else -1
+            self.bitboards.generate_moves(check_info=self.get_check_info(), en_passant_sq=en_passant_sq, buffer=buffer)
+            return buffer
+
+        count = 0
+        for move in self.iterate_legal_moves():
+            buffer.moves[count] = move
+            count += 1
+        buffer.count = count
+        return buffer
+
+    def iterate_legal_moves(self) -> Iterator[int]:
+        """Encoded legal moves of the side to move, generated lazily."""
+        en_passant_sq = square(self.en_passant) if self.en_passant else -1
+        if self.move_generator == "bitboard":
+            yield from self.bitboards.iterate_moves(check_info=self.get_check_info(), en_passant_sq=en_passant_sq)
+            return
+        for piece_name, piece in list(self.pieces.items()):
+            if piece.is_white == self.white_turn:
+                yield from self.iterate_piece_moves(piece_name=piece_name, en_passant_sq=en_passant_sq)
+
+    def iterate_piece_moves(self, piece_name: str, en_passant_sq: int) -> Iterator[int]:
+        """Encoded legal moves of one piece, flagged like the moves of the bitboard generator."""
+        piece = self.pieces[piece_name]
+        from_sq = square(piece.pos)
+        is_pawn = piece.piece.lower() == "p"
+        for move in self.get_possible_moves_per_piece(piece_name=piece_name):
+            to_sq = square(move)
+            flags = CAPTURE if self.board[to_sq] is not None else 0
+            if is_pawn and to_sq == en_passant_sq:
+                flags = CAPTURE | EN_PASSANT
+            elif is_pawn and abs(to_sq - from_sq) == 16:
+                flags = DOUBLE_PUSH
+            yield encode_move(from_sq, to_sq, flags)
+
+    @timed()
+    def get_piece_legal_moves(self, piece_name: str) -> List[int]:
+        """
+        Encoded legal moves of one piece, none for pieces of the side not to move. They are generated on the first
+        call and reused until a move changes the position.
+        """
+        moves = self.piece_moves.get(piece_name)
+        if moves is None:
+            moves = []
+            if self.pieces[piece_name].is_white == self.white_turn:
+                en_passant_sq = square(self.en_passant) if self.en_passant else -1
+                moves = list(self.iterate_piece_moves(piece_name=piece_name, en_passant_sq=en_passant_sq))
+            self.piece_moves[piece_name] = moves
+        return moves
+
+    def has_legal_move(self) -> bool:
+        """Whether the side to move can move, stopping at the first legal move found."""
+        for _ in self.iterate_legal_moves():
+            return True
+        return False
+
+    def get_repetition_count(self) -> int:
+        """
+        How often the current position occurred, counting positions with the same pieces, side to move and
+        en passant square. Castling rights don't exist yet, so they aren't part of the position.
+        """
+        return self.position_counts.get(self.zobrist_key, 0)
+
+    @property
+    def fullmove_number(self) -> int:
+        plies = len(self.move_stack) + (0 if self.start_white_turn else 1)
+        return self.start_fullmove_number + plies // 2
+
+    def get_termination(self, has_legal_move: Optional[bool] = None) -> Optional[str]:
+        """
+        Why the game is over: "checkmate", "stalemate", "threefold repetition" or "fifty-move rule", None while it
+        goes on. Callers that already generated the legal moves can pass whether there were any.
+        """
+        if has_legal_move is None:
+            has_legal_move = self.has_legal_move()
+        if not has_legal_move:
+            return "checkmate" if self.get_check_info().checkers else "stalemate"
+        if self.get_repetition_count() >= 3:
+            return "threefold repetition"
+        if self.halfmove_clock >= 100:
+            return "fifty-move rule"
+        return None
+
+    def get_result(self, termination: Optional[str]) -> Optional[str]:
+        """PGN result of a finished game, "1-0", "0-1" or "1/2-1/2", None while it goes on."""
+        if termination is None:
+            return None
+        if termination == "checkmate":
+            return "0-1" if self.white_turn else "1-0"
+        return "1/2-1/2"
+
+    def decode_move(self, move: int) -> Tuple[str, List[int]]:
+        """Piece name and target position of an encoded move of the current position."""
+        return self.board[move & FROM_MASK], list(POSITIONS[move >> TO_SHIFT & FROM_MASK])
+
+    def make_encoded_move(self, move: int) -> MoveRecord:
+        # make_move copies new_pos, so the shared position list is safe to pass.
+        return self.make_move(piece_name=self.board[move & FROM_MASK], new_pos=POSITIONS[move >> TO_SHIFT & FROM_MASK])
+
+    def get_possible_moves_per_piece(self, piece_name: str) -> List:
+        possible_moves = self.calculate_possible_moves(piece_name=piece_name, en_passant=self.en_passant)
+        if len(possible_moves) > 0:
+            possible_moves = self.filter_illegal_moves(moves=possible_moves, piece_name=piece_name)
+        return possible_moves
+
+    def get_check_info(self) -> CheckInfo:
+        if self.check_info is None or self.check_info.is_white != self.white_turn:
+            self.check_info = self.bitboards.get_check_info(is_white=self.white_turn)
+        return self.check_info
+
+    @timed()
+    def filter_illegal_moves(self, moves: List, piece_name: str) -> List:
+        """Keeps the moves that don't leave the own king in check, using the attack and pin maps of the position."""
+        check_info = self.get_check_info()
+        piece = self.pieces[piece_name]
+        return [
+            move
+            for move in moves
+            if self.bitboards.is_legal_move(
+                check_info=check_info, piece=piece.piece, from_pos=piece.pos, to_pos=move, en_passant=self.en_passant
+            )
+        ]
+
+    def update_piece_position(self, piece_name: str, new_pos: List[int]):
+        old_pos = self.pieces_pos[piece_name]
+        self.bitboards.move_piece(piece=piece_name[0], old_pos=old_pos, new_pos=new_pos)
+        self.zobrist_key ^= zobrist.get_piece_key(piece_name[0], old_pos) ^ zobrist.get_piece_key(piece_name[0], new_pos)
+        piece_square_values = evaluation.PIECE_SQUARE_VALUES[piece_name[0]]
+        self.piece_square_score += piece_square_values[square(new_pos)] - piece_square_values[square(old_pos)]
+        self.board[square(old_pos)] = None
+        self.board[square(new_pos)] = piece_name
+        self.pieces[piece_name].pos = new_pos
+        self.pieces_pos[piece_name] = new_pos
+        self.check_info = None
+        self.piece_moves = {}
+
+    def get_piece_from_position(self, pos: List[int]) -> Optional[str]:
+        return self.board[square(pos)]
+
+    def capture_piece(self, pos: List[int]) -> Optional[str]:
+        piece_name = self.get_piece_from_position(pos)
+        if piece_name:
+            self.remove_piece(piece_name)
+        return piece_name
+
+    def remove_piece(self, piece_name: str):
+        self.pieces.pop(piece_name)
+        pos = self.pieces_pos.pop(piece_name)
+        self.board[square(pos)] = None
+        self.bitboards.remove_piece(piece=piece_name[0], pos=pos)
+        self.zobrist_key ^= zobrist.get_piece_key(piece_name[0], pos)
+        self.piece_square_score -= evaluation.get_piece_square_value(piece_name[0], pos)
+        self.check_info = None
+        self.piece_moves = {}
+
+    def add_piece(self, piece_name: str, piece: Piece):
+        self.pieces[piece_name] = piece
+        self.pieces_pos[piece_name] = piece.pos
+        self.board[square(piece.pos)] = piece_name
+        self.bitboards.add_piece(piece=piece.piece, pos=piece.pos)
+        self.zobrist_key ^= zobrist.get_piece_key(piece.piece, piece.pos)
+        self.piece_square_score += evaluation.get_piece_square_value(piece.piece, piece.pos)
+        self.check_info = None
+        self.piece_moves = {}
+
+    def make_move(self, piece_name: str, new_pos: List[int]) -> MoveRecord:
+        """
+        Plays a move for the side to move and pushes a record of it on move_stack, so unmake_move can take it back.
+        Unlike move_piece it doesn't generate the moves of the new position.
+        """
+        old_pos = self.pieces_pos[piece_name]
+        piece = self.pieces[piece_name]
+        new_pos = list(new_pos)
+
+        capture_pos = new_pos
+        if piece.piece.lower() == "p" and new_pos == self.en_passant:
+            if self.white_turn:
+                capture_pos = [new_pos[0], new_pos[1] + 1]
+            else:
+                capture_pos = [new_pos[0], new_pos[1] - 1]
+        captured_name = self.get_piece_from_position(capture_pos)
+
+        record = MoveRecord(
+            piece_name=piece_name,
+            old_pos=old_pos,
+            new_pos=new_pos,
+            captured_name=captured_name,
+            captured_piece=self.pieces[captured_name] if captured_name else None,
+            en_passant=self.en_passant,
+            zobrist_key=self.zobrist_key,
+            check_info=self.check_info,
+            in_game=self.in_game,
+            halfmove_clock=self.halfmove_clock,
+        )
+
+        if captured_name:
+            self.remove_piece(captured_name)
+
+        if piece.piece.lower() == "p":
+            self.allow_en_passant(old_pos=old_pos, new_pos=new_pos)
+        else:
+            self.set_en_passant([])
+
+        self.update_piece_position(piece_name=piece_name, new_pos=new_pos)
+        self.white_turn = not self.white_turn
+        self.zobrist_key ^= zobrist.BLACK_TO_MOVE_KEY
+        if self.debug_zobrist:
+            self.verify_zobrist_key()
+            self.verify_piece_square_score()
+        if captured_name or piece.piece.lower() == "p":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.position_counts[self.zobrist_key] = self.position_counts.get(self.zobrist_key, 0) + 1
+
+        self.move_stack.append(record)
+        return record
+
+    def unmake_move(self) -> MoveRecord:
+        """Takes back the last move and restores the position exactly as it was before it."""
+        record = self.move_stack.pop()
+        count = self.position_counts[self.zobrist_key]
+        if count == 1:
+            del self.position_counts[self.zobrist_key]
+        else:
+            self.position_counts[self.zobrist_key] = count - 1
+        self.white_turn = not self.white_turn
+        self.update_piece_position(piece_name=record.piece_name, new_pos=record.old_pos)
+        if record.captured_piece is not None:
+            self.add_piece(piece_name=record.captured_name, piece=record.captured_piece)
+        self.en_passant = record.en_passant
+        self.zobrist_key = record.zobrist_key
+        self.check_info = record.check_info
+        self.in_game = record.in_game
+        self.halfmove_clock = record.halfmove_clock
+        return record
+
+    def move_piece(self, piece_name: str, new_pos: List[int]) -> Optional[str]:
+        """
+        Plays a move for the side to move and passes the turn.
+        Returns the name of the captured piece, if any.
+        """
+        record = self.make_move(piece_name=piece_name, new_pos=new_pos)
+        if self.get_termination() is not None:
+            self.in_game = False
+
+        return record.captured_name
+
+    def allow_en_passant(self, old_pos: List[int], new_pos: List[int]):
+        is_correct_rank = new_pos[1] in [3, 4]
+        was_moved_by_two = abs(new_pos[1] - old_pos[1]) == 2
+        if is_correct_rank and was_moved_by_two:
+            x, y = new_pos
+            if self.white_turn:
+                y = y + 1
+            else:
+                y = y - 1
+            self.set_en_passant([x, y])
+        else:
+            self.set_en_passant([])
+
+    def set_en_passant(self, en_passant: List):
+        self.zobrist_key ^= zobrist.get_en_passant_key(self.en_passant) ^ zobrist.get_en_passant_key(en_passant)
+        self.en_passant = en_passant
+
+    def verify_zobrist_key(self):
+        key = zobrist.calculate_key(self.pieces_pos, self.white_turn, self.en_passant)
+        if key != self.zobrist_key:
+            raise RuntimeError(f"Incremental Zobrist key {self.zobrist_key:016x} doesn't match recomputed key {key:016x}")
+
+    def verify_piece_square_score(self):
+        score = evaluation.calculate_piece_square_score(self.pieces_pos)
+        if score != self.piece_square_score:
+            raise RuntimeError(f"Incremental piece-square score {self.piece_square_score} doesn't match recomputed score {score}")
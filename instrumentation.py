@@ -0,0 +1,291 @@
+"""
+Opt-in timing of the hot paths: clicks, move generation and legality filtering.
+
+Functions are wrapped with the timed decorator when the module is imported with config.INSTRUMENTATION set (from the
+CHESS_INSTRUMENTATION environment variable), otherwise timed returns the function unchanged and costs nothing.
+Every timer keeps a count, total, min, max and a latency histogram with logarithmic buckets. Metrics keep the same
+summary of any other value, like the nodes and nodes/second of engine searches. Snapshots can be written as JSON or
+CSV, and optionally logged every config.INSTRUMENTATION_LOG_SECONDS.
+
+Profiler wraps cProfile for whole sessions (CHESS_PROFILE=path) or on demand with the config.PROFILE_HOTKEY key.
+"""
+import cProfile
+import csv
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+# Upper bounds of the histogram buckets in microseconds, the last bucket takes everything slower.
+BUCKET_BOUNDS_US = [10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000]
+
+
+class Timer:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_US) + 1)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        microseconds = seconds * 1e6
+        for index, bound in enumerate(BUCKET_BOUNDS_US):
+            if microseconds <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def get_percentile(self, percentile: float) -> float:
+        """Upper bound of the bucket holding the percentile in seconds, the max for the overflow bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if seen >= rank:
+                return min(BUCKET_BOUNDS_US[index] / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+            "min_ms": self.min * 1e3 if self.count else 0.0,
+            "max_ms": self.max * 1e3,
+            "p50_ms": self.get_percentile(50) * 1e3,
+            "p90_ms": self.get_percentile(90) * 1e3,
+            "p99_ms": self.get_percentile(99) * 1e3,
+            "buckets_us": dict(zip([str(bound) for bound in BUCKET_BOUNDS_US] + ["inf"], self.buckets)),
+        }
+
+
+class Metric:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.last = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+            "last": self.last,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.timers: Dict[str, Timer] = {}
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, name: str, seconds: float):
+        # Timed functions run on the Tk thread and on the background worker.
+        with self.lock:
+            if name not in self.timers:
+                self.timers[name] = Timer(name)
+            self.timers[name].add(seconds)
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Metric(name)
+            self.metrics[name].add(value)
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.metrics = {}
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "started": self.started,
+                "time": time.time(),
+                "timers": [timer.to_dict() for timer in sorted(self.timers.values(), key=lambda timer: timer.name)],
+                "metrics": [metric.to_dict() for metric in sorted(self.metrics.values(), key=lambda metric: metric.name)],
+            }
+
+
+registry = Registry()
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator recording the duration of every call, a no-op unless instrumentation is enabled."""
+
+    def decorator(function: Callable) -> Callable:
+        if not config.INSTRUMENTATION:
+            return function
+        timer_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                registry.record(timer_name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+CSV_FIELDS = ["name", "count", "total_s", "mean_ms", "min_ms", "max_ms", "p50_ms", "p90_ms", "p99_ms"]
+BUCKET_FIELDS = [f"le_{bound}us" for bound in BUCKET_BOUNDS_US] + ["le_inf"]
+
+
+def write_snapshot(path: str = config.INSTRUMENTATION_PATH):
+    """Writes the timers as CSV when the path ends with .csv, the timers and metrics as JSON otherwise."""
+    snapshot = registry.snapshot()
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS + BUCKET_FIELDS)
+            writer.writeheader()
+            for timer in snapshot["timers"]:
+                row = {field: timer[field] for field in CSV_FIELDS}
+                row.update(zip(BUCKET_FIELDS, timer["buckets_us"].values()))
+                writer.writerow(row)
+        else:
+            json.dump(snapshot, f, indent=2)
+
+
+def format_snapshot() -> str:
+    lines = []
+    snapshot = registry.snapshot()
+    for timer in snapshot["timers"]:
+        lines.append(
+            f"{timer['name']}: {timer['count']} calls, mean {timer['mean_ms']:.3f} ms, "
+            f"p50 {timer['p50_ms']:.3f} ms, p99 {timer['p99_ms']:.3f} ms, max {timer['max_ms']:.3f} ms"
+        )
+    for metric in snapshot["metrics"]:
+        lines.append(
+            f"{metric['name']}: {metric['count']} values, mean {metric['mean']:.1f}, "
+            f"min {metric['min']:.1f}, max {metric['max']:.1f}, last {metric['last']:.1f}"
+        )
+    return "\n".join(lines)
+
+
+class PeriodicLog:
+    """Prints the timers, and writes them to path if given, every interval seconds on a daemon thread."""
+
+    def __init__(self, interval: float, path: Optional[str] = None):
+        self.interval = interval
+        self.path = path
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            print(format_snapshot())
+            if self.path:
+                write_snapshot(self.path)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class Profiler:
+    """
+    cProfile for the Tk thread and for the jobs of the background worker. A profile only sees the thread that
+    enabled it, so every thread running code through run gets its own, and they are merged when stopping.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.profiles: Dict[int, cProfile.Profile] = {}
+        self.lock = threading.Lock()
+
+    def enable_profile(self) -> Optional[cProfile.Profile]:
+        """Enables the profile of the current thread, None when another profiler is already active."""
+        thread_id = threading.get_ident()
+        with self.lock:
+            profile = self.profiles.get(thread_id) or cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process.
+            return None
+        # Only profiles that were enabled are kept, pstats can't load one that never ran.
+        with self.lock:
+            self.profiles[thread_id] = profile
+        return profile
+
+    def start(self):
+        if self.active:
+            return
+        self.profiles = {}
+        self.main_profile = self.enable_profile()
+        self.active = self.main_profile is not None
+
+    def run(self, function: Callable, *args) -> Any:
+        if not self.active:
+            return function(*args)
+        profile = self.enable_profile()
+        if profile is None:
+            # The job runs unprofiled.
+            return function(*args)
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+
+    def stop(self, path: Optional[str] = config.PROFILE_PATH, top: int = 20) -> str:
+        """Stops profiling, writes the merged stats to path and returns the top functions by cumulative time."""
+        if not self.active:
+            return ""
+        self.main_profile.disable()
+        self.active = False
+        with self.lock:
+            profiles: List[cProfile.Profile] = list(self.profiles.values())
+        for profile in profiles:
+            profile.create_stats()
+        profiles = [profile for profile in profiles if profile.stats]
+        if not profiles:
+            return ""
+        output = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=output)
+        if path:
+            stats.dump_stats(path)
+        stats.sort_stats("cumulative").print_stats(top)
+        return output.getvalue()
+
+    def toggle(self) -> str:
+        if self.active:
+            return self.stop()
+        self.start()
+        return ""
+
+
+profiler = Profiler()
@@ -0,0 +1,83 @@
+"""
+Moves encoded as small integers: bits 0-5 hold the from square, bits 6-11 the to square and bits 12-15 the flags,
+with squares numbered y * 8 + x as in bitboard.square. A move costs one small int instead of a piece name and a
+fresh [x, y] list, and the generator writes them into a MoveBuffer that is allocated once and reused.
+"""
+from typing import Iterator, List
+
+CAPTURE = 1
+EN_PASSANT = 2
+DOUBLE_PUSH = 4
+# Reserved, promotion isn't implemented yet.
+PROMOTION = 8
+
+FROM_MASK = 0x3F
+TO_SHIFT = 6
+FLAGS_SHIFT = 12
+
+# More than the 218 legal moves of the richest known position.
+MAX_MOVES = 256
+
+# Shared [x, y] of every square, callers that keep a position must copy it.
+POSITIONS = [[sq & 7, sq >> 3] for sq in range(64)]
+SQUARE_NAMES = [f"{'abcdefgh'[sq & 7]}{8 - (sq >> 3)}" for sq in range(64)]
+
+
+def encode_move(from_sq: int, to_sq: int, flags: int = 0) -> int:
+    return from_sq | to_sq << TO_SHIFT | flags << FLAGS_SHIFT
+
+
+def get_from_square(move: int) -> int:
+    return move & FROM_MASK
+
+
+def get_to_square(move: int) -> int:
+    return move >> TO_SHIFT & FROM_MASK
+
+
+def get_flags(move: int) -> int:
+    return move >> FLAGS_SHIFT
+
+
+def is_capture(move: int) -> bool:
+    return bool(move >> FLAGS_SHIFT & CAPTURE)
+
+
+def get_move_name(move: int) -> str:
+    """Coordinate notation like e2e4, with rank 1 at y = 7."""
+    return SQUARE_NAMES[move & FROM_MASK] + SQUARE_NAMES[move >> TO_SHIFT & FROM_MASK]
+
+
+class MoveBuffer:
+    """Preallocated list of encoded moves, moves[:count] are valid. Filling it again overwrites the old moves."""
+
+    __slots__ = ("moves", "count")
+
+    def __init__(self, size: int = MAX_MOVES):
+        self.moves = [0] * size
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        moves = self.moves
+        for index in range(self.count):
+            yield moves[index]
+
+    def to_list(self) -> List[int]:
+        return self.moves[: self.count]
+
+
+class MoveBuffers:
+    """One MoveBuffer per ply of a search, so a recursive search allocates no move lists."""
+
+    __slots__ = ("buffers",)
+
+    def __init__(self, max_ply: int = 64):
+        self.buffers = [MoveBuffer() for _ in range(max_ply)]
+
+    def __getitem__(self, ply: int) -> MoveBuffer:
+        if ply >= len(self.buffers):
+            self.buffers.extend(MoveBuffer() for _ in range(ply + 1 - len(self.buffers)))
+        return self.buffers[ply]
@@ -0,0 +1,186 @@
+"""
+Process pool driver for perft and bulk position analysis.
+
+The root of the tree is split into move sequences, deep enough to give every worker several tasks, and each
+task is sent to a worker together with a pickled copy of the headless Game. Results are merged in task order,
+so node counts and analysis output don't depend on which worker finished first.
+
+    python parallel.py --depth 5 --workers 32
+    python parallel.py --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1" --depth 5 --divide
+    python parallel.py --positions positions.fen --depth 2 --workers 32 > analysis.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple
+
+import config
+from fen import STARTING_FEN, get_fen, parse_fen
+from game import Game
+from moves import get_move_name
+from perft import perft
+
+TASKS_PER_WORKER = 4
+
+# Encoded moves from the root, see moves.py.
+Path = List[int]
+
+
+def split_tree(game: Game, depth: int, task_count: int) -> List[Path]:
+    """Move sequences from the root, expanded one ply at a time until there are at least task_count of them."""
+    paths: List[Path] = [[]]
+    split_depth = 0
+    while len(paths) < task_count and split_depth < depth - 1:
+        expanded = []
+        for path in paths:
+            for move in path:
+                game.make_encoded_move(move)
+            for move in game.generate_moves().to_list():
+                expanded.append(path + [move])
+            for _ in path:
+                game.unmake_move()
+        paths = expanded
+        split_depth += 1
+    return paths
+
+
+def perft_task(task: Tuple[Game, Path, int]) -> int:
+    game, path, depth = task
+    for move in path:
+        game.make_encoded_move(move)
+    return perft(game=game, depth=depth)
+
+
+def run_perft_tasks(game: Game, depth: int, workers: int) -> Tuple[List[Path], List[int]]:
+    paths = split_tree(game=game, depth=depth, task_count=workers * TASKS_PER_WORKER)
+    tasks = [(game, path, depth - len(path)) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        nodes = list(executor.map(perft_task, tasks, chunksize=1))
+    return paths, nodes
+
+
+def parallel_perft(game: Game, depth: int, workers: int = None) -> int:
+    if depth <= 1:
+        return perft(game=game, depth=depth)
+    _, nodes = run_perft_tasks(game=game, depth=depth, workers=workers or os.cpu_count())
+    return sum(nodes)
+
+
+def parallel_divide(game: Game, depth: int, workers: int = None) -> Dict[str, int]:
+    """Node count below each root move, in the order the root moves are generated."""
+    results = {}
+    if depth <= 1:
+        for move in game.generate_moves().to_list():
+            results[get_move_name(move)] = 1
+        return results
+
+    paths, nodes = run_perft_tasks(game=game, depth=depth, workers=workers or os.cpu_count())
+    for path, path_nodes in zip(paths, nodes):
+        move_name = get_move_name(path[0])
+        results[move_name] = results.get(move_name, 0) + path_nodes
+    return results
+
+
+def analyse_position(fen: str, depth: int = 1, move_generator: str = config.MOVE_GENERATOR) -> Dict:
+    try:
+        game = parse_fen(fen, move_generator=move_generator)
+    except ValueError as error:
+        return {"fen": fen, "error": str(error)}
+
+    return {
+        "fen": get_fen(game),
+        "legal_moves": len(game.get_legal_moves()),
+        "in_check": game.get_check_info().checkers != 0,
+        "perft": perft(game=game, depth=depth),
+    }
+
+
+def analyse_chunk(task: Tuple[List[str], int, str]) -> List[Dict]:
+    fens, depth, move_generator = task
+    return [analyse_position(fen=fen, depth=depth, move_generator=move_generator) for fen in fens]
+
+
+def analyse_positions(
+    fens: Iterable[str], depth: int = 1, workers: int = None, chunksize: int = 64, move_generator: str = config.MOVE_GENERATOR
+) -> Iterable[Dict]:
+    """
+    Analyses FEN positions across a process pool and yields the results in input order.
+    FENs are read lazily and at most TASKS_PER_WORKER chunks per worker are in flight, so memory stays bounded
+    for files of any size.
+    """
+    workers = workers or os.cpu_count()
+    fens = iter(fens)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        while True:
+            while len(pending) < workers * TASKS_PER_WORKER:
+                chunk = list(islice(fens, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(analyse_chunk, (chunk, depth, move_generator)))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def read_fens(path: str) -> Iterable[str]:
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parallel perft and bulk position analysis")
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--divide", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--positions", help="file with one FEN per line to analyse instead of running perft")
+    parser.add_argument("--chunksize", type=int, default=64, help="positions sent to a worker at a time")
+    parser.add_argument("--generator", choices=config.MOVE_GENERATORS, default=config.MOVE_GENERATOR)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.positions:
+        count = 0
+        for result in analyse_positions(
+            fens=read_fens(args.positions),
+            depth=args.depth,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            move_generator=args.generator,
+        ):
+            print(json.dumps(result))
+            count += 1
+        seconds = time.perf_counter() - start
+        print(f"Analysed {count} positions in {seconds:.3f}s", file=sys.stderr)
+        return 0
+
+    try:
+        game = parse_fen(args.fen, move_generator=args.generator)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    if args.divide:
+        results = parallel_divide(game=game, depth=args.depth, workers=args.workers)
+        for move_name, nodes in sorted(results.items()):
+            print(f"{move_name}: {nodes}")
+        nodes = sum(results.values())
+        print(f"\nMoves: {len(results)}")
+    else:
+        nodes = parallel_perft(game=game, depth=args.depth, workers=args.workers)
+    seconds = time.perf_counter() - start
+    nps = nodes / seconds if seconds > 0 else 0.0
+    print(f"Nodes: {nodes}\nTime: {seconds:.3f}s\nNodes/second: {nps:.0f}\nWorkers: {args.workers}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
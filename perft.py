@@ -0,0 +1,254 @@
+"""
+Perft counts every leaf of the legal move tree to a fixed depth, which checks the move generator
+against known node counts and measures its speed.
+
+    python perft.py --depth 3
+    python perft.py --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1" --depth 2 --divide
+    python perft.py --suite --max-depth 3
+    python perft.py --benchmark --output bench.json --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import config
+from fen import STARTING_FEN, get_fen, parse_fen
+from game import Game
+from moves import MoveBuffers, get_move_name
+
+# Castling and promotion aren't implemented, so only positions and depths where neither can happen are listed.
+PERFT_POSITIONS = [
+    {
+        "name": "start",
+        "fen": STARTING_FEN,
+        "nodes": {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609},
+    },
+    {
+        "name": "position 3",
+        "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "nodes": {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624},
+    },
+    {
+        "name": "queen and knight vs king",
+        "fen": "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+        "nodes": {1: 37, 2: 183, 3: 6559, 4: 23527},
+    },
+    {
+        "name": "illegal en passant 1",
+        "fen": "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+        "nodes": {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429},
+    },
+    {
+        "name": "illegal en passant 2",
+        "fen": "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+        "nodes": {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655},
+    },
+    {
+        "name": "en passant gives check",
+        "fen": "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        "nodes": {1: 15, 2: 126, 3: 1928, 4: 13931},
+    },
+]
+
+# Positions parse_fen has to refuse, the move generators would count or crash on king captures from them.
+REJECTED_POSITIONS = [
+    {"name": "side not to move in check", "fen": "4k2R/8/8/8/8/8/8/4K3 w - - 0 1"},
+    {"name": "kings next to each other", "fen": "8/8/8/3kK3/8/8/8/8 b - - 0 1"},
+]
+
+BENCHMARK_DEPTHS = {
+    "start": 3,
+    "position 3": 4,
+    "queen and knight vs king": 3,
+    "illegal en passant 1": 4,
+    "illegal en passant 2": 4,
+    "en passant gives check": 4,
+}
+REGRESSION_TOLERANCE = 0.1
+
+
+def count_nodes(game: Game, depth: int, buffers: MoveBuffers, ply: int = 0) -> int:
+    buffer = game.generate_moves(buffers[ply])
+    if depth == 1:
+        return buffer.count
+
+    nodes = 0
+    for move in buffer:
+        game.make_encoded_move(move)
+        nodes += count_nodes(game=game, depth=depth - 1, buffers=buffers, ply=ply + 1)
+        game.unmake_move()
+    return nodes
+
+
+def perft(game: Game, depth: int) -> int:
+    if depth == 0:
+        return 1
+    return count_nodes(game=game, depth=depth, buffers=MoveBuffers(max_ply=depth))
+
+
+def divide(game: Game, depth: int) -> Dict[str, int]:
+    """Node count below each root move."""
+    results = {}
+    for move in game.generate_moves().to_list():
+        game.make_encoded_move(move)
+        results[get_move_name(move)] = perft(game=game, depth=depth - 1)
+        game.unmake_move()
+    return results
+
+
+def timed_perft(fen: str, depth: int, move_generator: str) -> Dict:
+    game = parse_fen(fen, move_generator=move_generator)
+    start = time.perf_counter()
+    nodes = perft(game=game, depth=depth)
+    seconds = time.perf_counter() - start
+    return {"nodes": nodes, "seconds": seconds, "nps": nodes / seconds if seconds > 0 else 0.0}
+
+
+def run_suite(max_depth: int, move_generator: str) -> bool:
+    all_passed = True
+    for position in PERFT_POSITIONS:
+        for depth, expected in sorted(position["nodes"].items()):
+            if depth > max_depth:
+                break
+            result = timed_perft(fen=position["fen"], depth=depth, move_generator=move_generator)
+            passed = result["nodes"] == expected
+            all_passed = all_passed and passed
+            status = "ok" if passed else "FAIL"
+            print(
+                f"{status:4} {position['name']:26} depth {depth}: {result['nodes']:>9} nodes "
+                f"(expected {expected}) {result['seconds']:8.2f}s {result['nps']:10.0f} nps"
+            )
+    for position in REJECTED_POSITIONS:
+        try:
+            parse_fen(position["fen"], move_generator=move_generator)
+            passed = False
+        except ValueError:
+            passed = True
+        all_passed = all_passed and passed
+        status = "ok" if passed else "FAIL"
+        print(f"{status:4} {position['name']:26} rejected")
+    return all_passed
+
+
+def get_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(move_generator: str, repeat: int) -> Dict:
+    positions = []
+    for position in PERFT_POSITIONS:
+        depth = BENCHMARK_DEPTHS[position["name"]]
+        runs = [timed_perft(fen=position["fen"], depth=depth, move_generator=move_generator) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["seconds"])
+        expected = position["nodes"].get(depth)
+        positions.append(
+            {
+                "name": position["name"],
+                "fen": position["fen"],
+                "depth": depth,
+                "nodes": best["nodes"],
+                "correct": expected is None or best["nodes"] == expected,
+                "seconds": best["seconds"],
+                "nps": best["nps"],
+            }
+        )
+        print(f"{position['name']:26} depth {depth}: {best['nodes']:>9} nodes {best['seconds']:8.2f}s {best['nps']:10.0f} nps")
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": get_revision(),
+        "move_generator": move_generator,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "positions": positions,
+    }
+
+
+def save_benchmark(result: Dict, output: str):
+    """Appends the run to the JSON list in output, so revisions can be compared over time."""
+    try:
+        with open(output) as f:
+            runs = json.load(f)
+    except FileNotFoundError:
+        runs = []
+    runs.append(result)
+    with open(output, "w") as f:
+        json.dump(runs, f, indent=2)
+
+
+def compare_benchmark(result: Dict, baseline_path: str) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if isinstance(baseline, list):
+        baseline = baseline[-1]
+
+    baseline_nps = {position["name"]: position["nps"] for position in baseline["positions"]}
+    no_regression = True
+    for position in result["positions"]:
+        if position["name"] not in baseline_nps or baseline_nps[position["name"]] == 0:
+            continue
+        change = position["nps"] / baseline_nps[position["name"]] - 1
+        regressed = change < -REGRESSION_TOLERANCE
+        no_regression = no_regression and not regressed and position["correct"]
+        status = "REGRESSION" if regressed else "ok"
+        print(f"{status:10} {position['name']:26} {change:+7.1%} nps vs {baseline.get('revision', 'baseline')}")
+    return no_regression
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Perft node counts and move generator benchmark")
+    parser.add_argument("--fen", default=STARTING_FEN, help="position to count, defaults to the starting position")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--suite", action="store_true", help="check the standard positions against their expected counts")
+    parser.add_argument("--max-depth", type=int, default=4, help="deepest suite depth to run")
+    parser.add_argument("--benchmark", action="store_true", help="time the standard positions")
+    parser.add_argument("--repeat", type=int, default=3, help="benchmark runs per position, the fastest one is kept")
+    parser.add_argument("--output", help="JSON file the benchmark run is appended to")
+    parser.add_argument("--compare", help="benchmark JSON file to check for nps regressions against")
+    parser.add_argument("--generator", choices=config.MOVE_GENERATORS, default=config.MOVE_GENERATOR)
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 0 if run_suite(max_depth=args.max_depth, move_generator=args.generator) else 1
+
+    if args.benchmark:
+        result = run_benchmark(move_generator=args.generator, repeat=args.repeat)
+        if args.output:
+            save_benchmark(result=result, output=args.output)
+        correct = all(position["correct"] for position in result["positions"])
+        if args.compare:
+            return 0 if compare_benchmark(result=result, baseline_path=args.compare) and correct else 1
+        return 0 if correct else 1
+
+    try:
+        game = parse_fen(args.fen, move_generator=args.generator)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    print(get_fen(game))
+    start = time.perf_counter()
+    if args.divide:
+        results = divide(game=game, depth=args.depth)
+        for move_name, nodes in sorted(results.items()):
+            print(f"{move_name}: {nodes}")
+        nodes = sum(results.values())
+        print(f"\nMoves: {len(results)}")
+    else:
+        nodes = perft(game=game, depth=args.depth)
+    seconds = time.perf_counter() - start
+    nps = nodes / seconds if seconds > 0 else 0.0
+    print(f"Nodes: {nodes}\nTime: {seconds:.3f}s\nNodes/second: {nps:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Streaming FEN and PGN readers that validate positions and games with the rules engine.
+
+Files are memory-mapped and read one line at a time, so archives of any size are processed without loading them.
+Every SAN move is resolved against the legal moves from Game.get_possible_moves_per_piece and played with make_move.
+Castling and promotion aren't implemented, so games that contain them are reported as errors.
+
+    python pgn.py games.pgn --output valid.pgn --errors errors.jsonl
+    python pgn.py positions.fen --fen
+"""
+import argparse
+import json
+import mmap
+import re
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+from bitboard import square
+from fen import STARTING_FEN, get_fen, parse_fen
+from game import Game
+from utils import get_pos_from_square_name
+
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(=[NBRQ])?[+#]?[!?]*$")
+CASTLING_PATTERN = re.compile(r"^(O-O(-O)?|0-0(-0)?)[+#]?[!?]*$")
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+")
+TAG_PATTERN = re.compile(rb'^\[(\w+)\s+"(.*)"\]\s*$')
+RESULTS = ["1-0", "0-1", "1/2-1/2", "*"]
+PROGRESS_INTERVAL = 10000
+
+
+class SanError(ValueError):
+    pass
+
+
+class PgnGame:
+    def __init__(self, headers: Dict[str, str], moves: List[str], text: str, line_number: int):
+        self.headers = headers
+        self.moves = moves
+        self.text = text
+        self.line_number = line_number
+        self.game: Optional[Game] = None
+        self.error: Optional[str] = None
+        self.error_ply: Optional[int] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None
+
+
+class IngestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.valid = 0
+        self.invalid = 0
+
+    @property
+    def total(self) -> int:
+        return self.valid + self.invalid
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def per_second(self) -> float:
+        seconds = self.seconds
+        return self.total / seconds if seconds > 0 else 0.0
+
+    def add(self, is_valid: bool):
+        if is_valid:
+            self.valid += 1
+        else:
+            self.invalid += 1
+
+    def __str__(self):
+        return f"{self.total} read, {self.valid} valid, {self.invalid} invalid in {self.seconds:.2f}s ({self.per_second:.0f}/s)"
+
+
+def iterate_lines(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped.
+            return
+        with mapped:
+            yield from iter(mapped.readline, b"")
+
+
+def resolve_san(game: Game, san: str) -> Tuple[str, List[int]]:
+    """Piece name and target of a SAN move in the current position, raises SanError if it isn't exactly one legal move."""
+    if CASTLING_PATTERN.match(san):
+        raise SanError(f"Castling isn't supported: {san}")
+    match = SAN_PATTERN.match(san)
+    if match is None:
+        raise SanError(f"Can't read move {san}")
+    piece_letter, from_file, from_rank, capture, target, promotion = match.groups()
+    if promotion:
+        raise SanError(f"Promotion isn't supported: {san}")
+
+    piece_type = (piece_letter or "P") if game.white_turn else (piece_letter or "P").lower()
+    new_pos = get_pos_from_square_name(target)
+    is_capture = game.board[square(new_pos)] is not None or (piece_type.lower() == "p" and new_pos == game.en_passant)
+    if bool(capture) != is_capture:
+        raise SanError(f"Capture marker doesn't match the position: {san}")
+    if piece_letter is None and not capture:
+        # Pawn pushes stay on their file, so only the pawns on it need their moves generated.
+        from_file = target[0]
+
+    candidates = []
+    for piece_name, piece in list(game.pieces.items()):
+        if piece.piece != piece_type:
+            continue
+        if from_file is not None and piece.pos[0] != ord(from_file) - ord("a"):
+            continue
+        if from_rank is not None and piece.pos[1] != 8 - int(from_rank):
+            continue
+        if new_pos in game.get_possible_moves_per_piece(piece_name=piece_name):
+            candidates.append(piece_name)
+
+    if len(candidates) == 0:
+        raise SanError(f"Illegal move {san}")
+    if len(candidates) > 1:
+        raise SanError(f"Ambiguous move {san}")
+    return candidates[0], new_pos
+
+
+def strip_movetext(movetext: str) -> List[str]:
+    """SAN tokens of the main line, without comments, variations, NAGs, move numbers and the result."""
+    tokens = []
+    comment = False
+    variation_depth = 0
+    for line in movetext.splitlines():
+        if line.startswith("%"):
+            continue
+        position = 0
+        while position < len(line):
+            char = line[position]
+            if comment:
+                if char == "}":
+                    comment = False
+                position += 1
+                continue
+            if char == "{":
+                comment = True
+                position += 1
+                continue
+            if char == ";":
+                break
+            if char == "(":
+                variation_depth += 1
+                position += 1
+                continue
+            if char == ")":
+                variation_depth = max(variation_depth - 1, 0)
+                position += 1
+                continue
+            if char.isspace():
+                position += 1
+                continue
+            end = position
+            while end < len(line) and not line[end].isspace() and line[end] not in "{}();":
+                end += 1
+            token = line[position:end]
+            position = end
+            if variation_depth > 0:
+                continue
+            token = MOVE_NUMBER_PATTERN.sub("", token)
+            if not token or token.startswith("$") or token in RESULTS:
+                continue
+            tokens.append(token)
+    return tokens
+
+
+def validate_game(pgn_game: PgnGame, move_generator: str = config.MOVE_GENERATOR) -> PgnGame:
+    try:
+        if pgn_game.headers.get("SetUp") == "1" or "FEN" in pgn_game.headers:
+            game = parse_fen(pgn_game.headers.get("FEN", STARTING_FEN), move_generator=move_generator)
+        else:
+            game = Game(move_generator=move_generator)
+    except ValueError as error:
+        pgn_game.error = str(error)
+        return pgn_game
+
+    for ply, san in enumerate(pgn_game.moves):
+        try:
+            piece_name, new_pos = resolve_san(game=game, san=san)
+        except SanError as error:
+            pgn_game.error = str(error)
+            pgn_game.error_ply = ply
+            break
+        game.make_move(piece_name=piece_name, new_pos=new_pos)
+    pgn_game.game = game
+    return pgn_game
+
+
+def read_pgn(path: str) -> Iterator[PgnGame]:
+    """Yields the games of a PGN file one by one, with headers, main line SAN moves and the raw text."""
+    headers: Dict[str, str] = {}
+    lines: List[str] = []
+    movetext: List[str] = []
+    start_line = 1
+    for line_number, raw_line in enumerate(iterate_lines(path), start=1):
+        line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+        tag = TAG_PATTERN.match(raw_line.strip())
+        if tag and not movetext:
+            if not lines:
+                start_line = line_number
+            headers[tag.group(1).decode()] = tag.group(2).decode("utf-8", errors="replace")
+            lines.append(line)
+            continue
+        if tag and movetext:
+            yield PgnGame(
+                headers=headers, moves=strip_movetext("\n".join(movetext)), text="\n".join(lines), line_number=start_line
+            )
+            headers, lines, movetext = {tag.group(1).decode(): tag.group(2).decode("utf-8", errors="replace")}, [line], []
+            start_line = line_number
+            continue
+        if not lines and not line.strip():
+            continue
+        if not lines:
+            start_line = line_number
+        lines.append(line)
+        if line.strip():
+            movetext.append(line)
+    if movetext or headers:
+        yield PgnGame(headers=headers, moves=strip_movetext("\n".join(movetext)), text="\n".join(lines), line_number=start_line)
+
+
+def validate_pgn(path: str, move_generator: str = config.MOVE_GENERATOR, stats: IngestStats = None) -> Iterator[PgnGame]:
+    for pgn_game in read_pgn(path):
+        pgn_game = validate_game(pgn_game=pgn_game, move_generator=move_generator)
+        if stats is not None:
+            stats.add(pgn_game.is_valid)
+        yield pgn_game
+
+
+def read_fens(
+    path: str, move_generator: str = config.MOVE_GENERATOR, stats: IngestStats = None
+) -> Iterator[Tuple[int, str, Optional[Game], Optional[str]]]:
+    """Yields (line number, FEN, game, error) for each non-empty line of a FEN or EPD file."""
+    for line_number, raw_line in enumerate(iterate_lines(path), start=1):
+        fen = raw_line.decode("utf-8", errors="replace").strip()
+        if not fen or fen.startswith("#"):
+            continue
+        try:
+            game, error = parse_fen(fen, move_generator=move_generator), None
+        except ValueError as exception:
+            game, error = None, str(exception)
+        if stats is not None:
+            stats.add(error is None)
+        yield line_number, fen, game, error
+
+
+def write_errors(errors, records: Iterable[Dict]):
+    for record in records:
+        errors.write(json.dumps(record) + "\n")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate FEN positions or PGN games with the rules engine")
+    parser.add_argument("path")
+    parser.add_argument("--fen", action="store_true", help="the file has one FEN per line instead of PGN games")
+    parser.add_argument("--output", help="file to write the valid games or positions to")
+    parser.add_argument("--errors", help="JSON lines file for the invalid ones, defaults to stderr")
+    parser.add_argument("--generator", choices=config.MOVE_GENERATORS, default=config.MOVE_GENERATOR)
+    args = parser.parse_args(argv)
+
+    stats = IngestStats()
+    output = open(args.output, "w") if args.output else None
+    errors = open(args.errors, "w") if args.errors else sys.stderr
+    try:
+        if args.fen:
+            for line_number, fen, game, error in read_fens(args.path, move_generator=args.generator, stats=stats):
+                if error is not None:
+                    write_errors(errors, [{"line": line_number, "fen": fen, "error": error}])
+                elif output is not None:
+                    output.write(get_fen(game) + "\n")
+                if stats.total % PROGRESS_INTERVAL == 0:
+                    print(stats, file=sys.stderr)
+        else:
+            for pgn_game in validate_pgn(args.path, move_generator=args.generator, stats=stats):
+                if not pgn_game.is_valid:
+                    record = {"line": pgn_game.line_number, "ply": pgn_game.error_ply, "error": pgn_game.error}
+                    write_errors(errors, [record])
+                elif output is not None:
+                    output.write(pgn_game.text.rstrip() + "\n\n")
+                if stats.total % PROGRESS_INTERVAL == 0:
+                    print(stats, file=sys.stderr)
+    finally:
+        if output is not None:
+            output.close()
+        if args.errors:
+            errors.close()
+
+    print(stats, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Packed binary positions and an append-only store of them that is memory-mapped as a NumPy structured array.
+
+A position takes POSITION_DTYPE.itemsize (25) bytes: the occupancy bitboard, one nibble per occupied square in
+square order (bit 3 set for black, the low bits the piece type) and a flags byte with the side to move and the
+en-passant file. Pieces come back named like in fen.parse_fen, so packing a game and unpacking it gives the same names.
+
+    store = PositionStore("positions.bin")
+    store.extend(games)
+    boards, white_turn, en_passant = to_batch(store.records[:1000000])
+"""
+import os
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+import config
+from bitboard import square
+from game import Game
+
+POSITION_DTYPE = np.dtype([("occupancy", "<u8"), ("pieces", "u1", (16,)), ("flags", "u1")])
+STORE_MAGIC = b"CHESSPOS"
+STORE_VERSION = 1
+HEADER_SIZE = 16
+
+PIECE_NIBBLES = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6, "p": 9, "n": 10, "b": 11, "r": 12, "q": 13, "k": 14}
+NIBBLE_PIECES = {nibble: piece for piece, nibble in PIECE_NIBBLES.items()}
+BLACK_TO_MOVE_FLAG = 1
+EN_PASSANT_SHIFT = 4
+
+# Nibble to the signed codes of batch.BATCH_PIECE_CODES.
+NIBBLE_TO_BATCH_CODE = np.array([0, 1, 2, 3, 4, 5, 6, 0, 0, -1, -2, -3, -4, -5, -6, 0], dtype=np.int8)
+
+
+def pack_position(game: Game) -> np.ndarray:
+    """Single POSITION_DTYPE record of the game."""
+    occupancy = 0
+    nibbles = [0] * 64
+    for piece_name, pos in game.pieces_pos.items():
+        sq = square(pos)
+        occupancy |= 1 << sq
+        nibbles[sq] = PIECE_NIBBLES[piece_name[0]]
+    codes = [nibbles[sq] for sq in range(64) if occupancy >> sq & 1]
+    if len(codes) > 32:
+        raise ValueError(f"Can't pack a position with {len(codes)} pieces")
+    codes += [0] * (32 - len(codes))
+
+    record = np.zeros((), dtype=POSITION_DTYPE)
+    record["occupancy"] = occupancy
+    record["pieces"] = [codes[i] | codes[i + 1] << 4 for i in range(0, 32, 2)]
+    flags = 0 if game.white_turn else BLACK_TO_MOVE_FLAG
+    if game.en_passant:
+        flags |= (game.en_passant[0] + 1) << EN_PASSANT_SHIFT
+    record["flags"] = flags
+    return record
+
+
+def pack_games(games: Iterable[Game]) -> np.ndarray:
+    return np.array([pack_position(game) for game in games], dtype=POSITION_DTYPE)
+
+
+def unpack_position(record: np.ndarray, move_generator: str = config.MOVE_GENERATOR) -> Game:
+    occupancy = int(record["occupancy"])
+    packed = record["pieces"]
+    pieces_pos = {}
+    piece_counts = {}
+    index = 0
+    for sq in range(64):
+        if not occupancy >> sq & 1:
+            continue
+        nibble = packed[index >> 1] >> 4 * (index & 1) & 0xF
+        piece = NIBBLE_PIECES.get(int(nibble))
+        if piece is None:
+            raise ValueError(f"Invalid piece code {nibble} in packed position")
+        count = piece_counts.get(piece, 0)
+        piece_counts[piece] = count + 1
+        pieces_pos[f"{piece}{count}"] = [sq & 7, sq >> 3]
+        index += 1
+
+    flags = int(record["flags"])
+    white_turn = not flags & BLACK_TO_MOVE_FLAG
+    en_passant = []
+    en_passant_file = flags >> EN_PASSANT_SHIFT
+    if en_passant_file:
+        en_passant = [en_passant_file - 1, 2 if white_turn else 5]
+    return Game(pieces_pos=pieces_pos, white_turn=white_turn, en_passant=en_passant, move_generator=move_generator)
+
+
+def to_batch(records: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Boards, side to move and en-passant squares of packed records in the format of batch.get_legal_moves.
+    Works on whole arrays, so slices of a memory-mapped store are converted without creating a Game per record.
+    """
+    count = len(records)
+    occupancy = np.ascontiguousarray(records["occupancy"]).astype("<u8")
+    occupied = np.unpackbits(occupancy.view(np.uint8).reshape(count, 8), axis=1, bitorder="little").astype(bool)
+    packed = np.asarray(records["pieces"])
+    nibbles = np.empty((count, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = packed & 0xF
+    nibbles[:, 1::2] = packed >> 4
+
+    # The k-th occupied square of a record holds its k-th nibble.
+    piece_index = np.clip(np.cumsum(occupied, axis=1) - 1, 0, 31)
+    codes = np.take_along_axis(nibbles, piece_index, axis=1)
+    boards = np.where(occupied, NIBBLE_TO_BATCH_CODE[codes], 0).astype(np.int8).reshape(count, 8, 8)
+
+    flags = np.asarray(records["flags"])
+    white_turn = (flags & BLACK_TO_MOVE_FLAG) == 0
+    en_passant_file = (flags >> EN_PASSANT_SHIFT).astype(np.int8)
+    en_passant = np.where(en_passant_file > 0, np.where(white_turn, 16, 40) + en_passant_file - 1, -1).astype(np.int8)
+    return boards, white_turn, en_passant
+
+
+class PositionStore:
+    """
+    Append-only file of packed positions behind a small header. records maps the file read-only, so it can be
+    sliced and scanned like any NumPy array while the data stays on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(self.get_header())
+        else:
+            with open(path, "rb") as f:
+                header = f.read(HEADER_SIZE)
+            if header != self.get_header():
+                raise ValueError(f"{path} isn't a version {STORE_VERSION} position store")
+        self._records = None
+
+    @staticmethod
+    def get_header() -> bytes:
+        header = STORE_MAGIC + STORE_VERSION.to_bytes(4, "little") + POSITION_DTYPE.itemsize.to_bytes(4, "little")
+        return header.ljust(HEADER_SIZE, b"\0")
+
+    def __len__(self) -> int:
+        return (os.path.getsize(self.path) - HEADER_SIZE) // POSITION_DTYPE.itemsize
+
+    @property
+    def records(self) -> np.ndarray:
+        """Read-only memory map of all records, refreshed after appends."""
+        if self._records is None or len(self._records) != len(self):
+            if len(self) == 0:
+                return np.zeros(0, dtype=POSITION_DTYPE)
+            self._records = np.memmap(self.path, dtype=POSITION_DTYPE, mode="r", offset=HEADER_SIZE, shape=(len(self),))
+        return self._records
+
+    def append_records(self, records: np.ndarray):
+        records = np.asarray(records, dtype=POSITION_DTYPE)
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+
+    def append(self, game: Game):
+        self.append_records(pack_position(game).reshape(1))
+
+    def extend(self, games: Iterable[Game], chunksize: int = 65536):
+        chunk = []
+        for game in games:
+            chunk.append(pack_position(game))
+            if len(chunk) == chunksize:
+                self.append_records(np.array(chunk, dtype=POSITION_DTYPE))
+                chunk = []
+        if chunk:
+            self.append_records(np.array(chunk, dtype=POSITION_DTYPE))
+
+    def get_game(self, index: int, move_generator: str = config.MOVE_GENERATOR) -> Game:
+        return unpack_position(self.records[index], move_generator=move_generator)
+
+    def iterate_batches(self, batch_size: int = 65536) -> Iterator[np.ndarray]:
+        records = self.records
+        for start in range(0, len(records), batch_size):
+            end = start + batch_size
+            yield records[start:end]
@@ -0,0 +1,207 @@
+"""
+Asyncio server holding many headless games in one process, reachable over TCP or a Unix socket.
+
+Requests and responses are JSON objects, one per line. A request may carry an "id" that is echoed in its response,
+so a client can keep many requests in flight on one connection; responses can then arrive out of order.
+
+    {"id": 1, "op": "new"}                                   optional "fen" to start from a position
+    {"id": 2, "op": "move", "game": "<id>", "move": "e2e4"}  coordinate notation, rank 1 is white's back rank
+    {"id": 3, "op": "moves", "game": "<id>"}
+    {"id": 4, "op": "state", "game": "<id>"}
+    {"id": 5, "op": "close", "game": "<id>"}
+    {"id": 6, "op": "stats"}
+
+Successful responses have "ok": true and the fen, status ("playing" or how the game ended, see Game.get_termination)
+and legal moves of the game. Failed ones have "ok": false and an "error" message.
+
+Move validation and generation run on a thread pool, so a slow request never stalls the event loop, and a lock per
+game keeps the requests of one game in order.
+
+    python server.py --port 8765
+    python server.py --unix /tmp/chess.sock --workers 4
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from fen import STARTING_FEN, get_fen, parse_fen
+from game import Game
+from moves import get_move_name
+
+
+class ServerGame:
+    """A game with its legal moves by name, which are generated for every response and reused to check the next move."""
+
+    __slots__ = ("game", "lock", "moves")
+
+    def __init__(self, game: Game):
+        self.game = game
+        self.lock = asyncio.Lock()
+        self.moves: Dict[str, int] = {}
+
+    def get_state(self) -> Dict[str, Any]:
+        game = self.game
+        moves = game.generate_moves()
+        termination = game.get_termination(has_legal_move=moves.count > 0)
+        if termination is None:
+            self.moves = {get_move_name(move): move for move in moves}
+            status = "playing"
+        else:
+            game.in_game = False
+            self.moves = {}
+            status = termination
+        return {"fen": get_fen(game), "status": status, "moves": list(self.moves)}
+
+    def play_move(self, move_name: str) -> Dict[str, Any]:
+        if not self.game.in_game:
+            raise ValueError("Game is over")
+        if move_name not in self.moves:
+            raise ValueError(f"Illegal move {move_name}")
+        record = self.game.make_encoded_move(self.moves[move_name])
+        state = self.get_state()
+        state["captured"] = record.captured_name
+        return state
+
+
+class GameServer:
+    def __init__(self, max_games: int = config.SERVER_MAX_GAMES, workers: Optional[int] = config.SERVER_WORKERS):
+        self.max_games = max_games
+        self.games: Dict[str, ServerGame] = {}
+        # No workers runs the rules on the event loop, which is only useful to measure what the pool costs.
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers != 0 else None
+        self.requests = 0
+        self.connections = 0
+        self.started = time.monotonic()
+
+    async def run(self, function: Callable, *args) -> Any:
+        if self.executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def get_game(self, request: Dict[str, Any]) -> ServerGame:
+        game_id = request.get("game")
+        if not isinstance(game_id, str) or game_id not in self.games:
+            raise ValueError(f"Unknown game {game_id}")
+        return self.games[game_id]
+
+    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "new":
+            if len(self.games) >= self.max_games:
+                raise ValueError(f"Server is full with {self.max_games} games")
+            fen = request.get("fen", STARTING_FEN)
+            if not isinstance(fen, str):
+                raise ValueError("FEN must be a string")
+            server_game = ServerGame(await self.run(parse_fen, fen))
+            response = await self.run(server_game.get_state)
+            game_id = uuid.uuid4().hex
+            self.games[game_id] = server_game
+            response["game"] = game_id
+            return response
+        if op == "move":
+            server_game = self.get_game(request)
+            move_name = request.get("move")
+            if not isinstance(move_name, str):
+                raise ValueError("Move needs a move like e2e4")
+            async with server_game.lock:
+                return await self.run(server_game.play_move, move_name)
+        if op in ["moves", "state"]:
+            server_game = self.get_game(request)
+            async with server_game.lock:
+                return await self.run(server_game.get_state)
+        if op == "close":
+            self.get_game(request)
+            self.games.pop(request["game"])
+            return {}
+        if op == "stats":
+            return {
+                "games": len(self.games),
+                "connections": self.connections,
+                "requests": self.requests,
+                "uptime": time.monotonic() - self.started,
+            }
+        raise ValueError(f"Unknown op {op}")
+
+    async def handle_line(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        self.requests += 1
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            response = {"ok": True, **await self.handle_request(request)}
+        except ValueError as error:
+            response = {"ok": False, "error": str(error)}
+        except Exception as error:
+            # Every request gets a response, otherwise the client waits for it forever.
+            response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        async with write_lock:
+            try:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                # The client went away, the game stays until it is closed.
+                pass
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    # Reset connections and lines over the stream limit end the connection.
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.handle_line(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, host: str = config.SERVER_HOST, port: int = config.SERVER_PORT, unix_path: Optional[str] = None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving games on {addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve headless games over line-delimited JSON.")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS, help="Threads validating moves, 0 for none")
+    parser.add_argument("--max-games", type=int, default=config.SERVER_MAX_GAMES)
+    args = parser.parse_args(argv)
+
+    server = GameServer(max_games=args.max_games, workers=args.workers)
+    try:
+        asyncio.run(server.serve(host=args.host, port=args.port, unix_path=args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import tkinter as tk
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageTk
+
+import config
+from utils import calculate_canvas_coordinates_from_board
+
+_piece_images: Dict[Tuple[str, int], ImageTk.PhotoImage] = {}
+
+
+def get_piece_image(piece: str, size: int = config.SQUARE_SIZE) -> ImageTk.PhotoImage:
+    """Image of a piece type, loaded on first use and shared by every square that shows the piece."""
+    key = (piece, size)
+    if key not in _piece_images:
+        color = "w" if piece.isupper() else "b"
+        image_name = f"{piece.lower()}{color}.png"
+        try:
+            image = Image.open(f"./resources/{image_name}")
+        except OSError:
+            raise OSError(f"Missing piece picture for {image_name}")
+        if image.width > size or image.height > size:
+            image = image.resize((size, size))
+        _piece_images[key] = ImageTk.PhotoImage(image)
+    return _piece_images[key]
+
+
+class BoardRenderer:
+    """
+    Draws the board once and afterwards only touches the squares that changed. Every square owns one image item
+    that is reconfigured or hidden, and move marks, the selection and the end of game message are reused as well,
+    so nothing is created or deleted while playing.
+    """
+
+    def __init__(self, canvas: tk.Canvas, square_size: int = config.SQUARE_SIZE):
+        self.canvas = canvas
+        self.square_size = square_size
+        self.piece_items: List[int] = []
+        self.drawn: List[Optional[str]] = [None] * 64
+        self.mark_items: List[int] = []
+        self.visible_marks = 0
+        self.select_item = None
+        self.message_item = None
+
+    def draw_board(self):
+        size = self.square_size
+        self.canvas.create_rectangle(0, 0, 8 * size, 8 * size, fill=config.WHITE_SQUARE_COLOR, outline=config.WHITE_SQUARE_COLOR)
+        for sq in range(64):
+            x, y = sq & 7, sq >> 3
+            if (x + y) % 2 == 1:
+                corners = (x * size, y * size, (x + 1) * size, (y + 1) * size)
+                self.canvas.create_rectangle(*corners, fill=config.DARK_SQUARE_COLOR, outline=config.DARK_SQUARE_COLOR)
+        for sq in range(64):
+            center_x, center_y = self.get_square_center([sq & 7, sq >> 3])
+            self.piece_items.append(self.canvas.create_image(center_x, center_y, anchor="center", state="hidden"))
+        self.select_item = self.canvas.create_rectangle(
+            0, 0, size, size, outline=config.SELECT_COLOR, width=config.SELECT_WIDTH, state="hidden"
+        )
+        self.message_item = self.canvas.create_text(
+            (4 * size, 4 * size), text="", anchor="center", font="Helvetica 18 bold", state="hidden"
+        )
+
+    def get_square_center(self, pos: List[int]) -> Tuple[float, float]:
+        canvas_x, canvas_y = calculate_canvas_coordinates_from_board(pos[0], pos[1])
+        return canvas_x + self.square_size / 2, canvas_y + self.square_size / 2
+
+    def render(self, board: List[Optional[str]], squares: Optional[Iterable[int]] = None) -> int:
+        """
+        Brings the pieces on the canvas in line with the mailbox board. Only the given squares are checked when the
+        caller knows which squares a move touched, otherwise all 64. Returns how many squares were redrawn.
+        """
+        redrawn = 0
+        for sq in range(64) if squares is None else squares:
+            piece = board[sq][0] if board[sq] is not None else None
+            if piece == self.drawn[sq]:
+                continue
+            if piece is None:
+                self.canvas.itemconfigure(self.piece_items[sq], state="hidden")
+            else:
+                self.canvas.itemconfigure(self.piece_items[sq], image=get_piece_image(piece, self.square_size), state="normal")
+            self.drawn[sq] = piece
+            redrawn += 1
+        return redrawn
+
+    def show_moves(self, moves: List[List[int]]):
+        offset = config.MOVE_MARK_SIZE_OFFSET
+        for index, pos in enumerate(moves):
+            center_x, center_y = self.get_square_center(pos)
+            coordinates = (center_x - offset, center_y - offset, center_x + offset, center_y + offset)
+            if index < len(self.mark_items):
+                self.canvas.coords(self.mark_items[index], *coordinates)
+                self.canvas.itemconfigure(self.mark_items[index], state="normal")
+            else:
+                self.mark_items.append(self.canvas.create_oval(coordinates, fill=config.MOVE_MARK_COLOR, outline=""))
+        shown, visible = len(moves), self.visible_marks
+        for item in self.mark_items[shown:visible]:
+            self.canvas.itemconfigure(item, state="hidden")
+        self.visible_marks = len(moves)
+
+    def hide_moves(self):
+        self.show_moves([])
+
+    def show_selection(self, pos: List[int]):
+        canvas_x, canvas_y = calculate_canvas_coordinates_from_board(pos[0], pos[1])
+        self.canvas.coords(self.select_item, canvas_x, canvas_y, canvas_x + self.square_size, canvas_y + self.square_size)
+        self.canvas.itemconfigure(self.select_item, state="normal")
+        self.canvas.tag_raise(self.select_item)
+
+    def hide_selection(self):
+        self.canvas.itemconfigure(self.select_item, state="hidden")
+
+    def show_message(self, text: str):
+        """Message over the board, which stays visible underneath."""
+        self.hide_moves()
+        self.hide_selection()
+        self.canvas.itemconfigure(self.message_item, text=text, state="normal")
+        self.canvas.tag_raise(self.message_item)
@@ -0,0 +1,555 @@
+"""
+Retrograde endgame tablebases for positions with up to four pieces and no pawns.
+
+A table holds one byte per position and side to move, indexed by the squares of the pieces in slot order
+(white king, white pieces, black king, black pieces, strongest first): 0 is a draw, INVALID a position that can't
+occur, and any other value v means the side to move is mated in v - 1 plies when that is even and mates in v - 1
+plies when it is odd. Tables are memory-mapped, so probing is an index calculation and a single byte read.
+
+Generation first counts the legal moves of every position in chunks spread over a process pool, looking up captures
+in the smaller tables, and then works backwards from the mates one ply at a time with un-moves. Both steps save their
+progress to a work directory, so an interrupted run picks up where it stopped.
+Pawns are left out because promotion isn't implemented, so pawn endings can't be solved.
+
+    python tablebase.py --all 3
+    python tablebase.py KQKR KRKB --workers 8
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import config
+from bitboard import BETWEEN, KING_ATTACKS, KNIGHT_ATTACKS, bishop_attacks, rook_attacks, square
+from game import Game
+
+MAX_PIECES = 4
+PIECE_ORDER = "QRBN"
+PIECE_STRENGTH = {"Q": 9, "R": 5, "B": 3, "N": 3}
+
+DRAW = 0
+UNKNOWN = 254
+INVALID = 255
+NOT_SCHEDULED = 255
+MAX_PLIES = 253
+
+TABLE_MAGIC = b"CHESSTB\0"
+TABLE_VERSION = 1
+HEADER_SIZE = 16
+CHUNK_SIZE = 1 << 15
+CHECKPOINT_SECONDS = 60
+
+Move = Tuple[str, List[int]]
+
+
+def get_empty_board_attacks(piece_type: str, sq: int) -> int:
+    if piece_type == "K":
+        return KING_ATTACKS[sq]
+    if piece_type == "N":
+        return KNIGHT_ATTACKS[sq]
+    attacks = 0
+    if piece_type in "RQ":
+        attacks |= rook_attacks(1 << sq, 0)
+    if piece_type in "BQ":
+        attacks |= bishop_attacks(1 << sq, 0)
+    return attacks
+
+
+def build_reach_tables() -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Per piece type, a 64x64 table of whether a piece reaches a square on an empty board, and per square the list of
+    those targets. The lists are padded with the square itself, which is always occupied by the piece and so skipped.
+    """
+    reach_tables = {}
+    reach_lists = {}
+    for piece_type in "KQRBN":
+        table = np.zeros((64, 64), dtype=bool)
+        targets = [[target for target in range(64) if get_empty_board_attacks(piece_type, sq) >> target & 1] for sq in range(64)]
+        length = max(len(sq_targets) for sq_targets in targets)
+        padded = np.array(
+            [sq_targets + [sq] * (length - len(sq_targets)) for sq, sq_targets in enumerate(targets)], dtype=np.int64
+        )
+        for sq, sq_targets in enumerate(targets):
+            table[sq, sq_targets] = True
+        reach_tables[piece_type] = table
+        reach_lists[piece_type] = padded
+    return reach_tables, reach_lists
+
+
+REACH_TABLES, REACH_LISTS = build_reach_tables()
+BETWEEN_TABLE = np.array(BETWEEN, dtype=np.uint64)
+SQUARE_BITS = np.array([1 << sq for sq in range(64)], dtype=np.uint64)
+
+
+class ProbeResult(NamedTuple):
+    """wdl is 1, 0 or -1 for a win, draw or loss of the side to move, plies the distance to mate."""
+
+    wdl: int
+    plies: int
+
+
+class Material:
+    """Pieces of a table like "KQKR", with the slot order used to index it."""
+
+    def __init__(self, name: str):
+        if name.count("K") != 2 or not name.startswith("K"):
+            raise ValueError(f"Invalid material {name}")
+        white, black = name[1:].split("K")
+        if any(piece not in PIECE_ORDER for piece in white + black):
+            raise ValueError(f"Tablebases only cover kings, queens, rooks, bishops and knights, not {name}")
+        self.white = "".join(sorted(white, key=PIECE_ORDER.index))
+        self.black = "".join(sorted(black, key=PIECE_ORDER.index))
+        self.name = f"K{self.white}K{self.black}"
+        self.types = ["K"] + list(self.white) + ["K"] + list(self.black)
+        self.white_slots = list(range(len(self.white) + 1))
+        self.black_slots = list(range(len(self.white) + 1, len(self.types)))
+        if len(self.types) > MAX_PIECES:
+            raise ValueError(f"Tablebases have up to {MAX_PIECES} pieces, {name} has {len(self.types)}")
+        self.size = 64 ** len(self.types)
+
+    @property
+    def is_canonical(self) -> bool:
+        """Tables are stored with the stronger side as white, the other colouring is probed with colours swapped."""
+        white = (sum(PIECE_STRENGTH[piece] for piece in self.white), self.white)
+        black = (sum(PIECE_STRENGTH[piece] for piece in self.black), self.black)
+        return white >= black
+
+    @property
+    def is_trivial(self) -> bool:
+        return not self.white and not self.black
+
+    def flipped(self) -> "Material":
+        return Material(f"K{self.black}K{self.white}")
+
+    def get_slot_order(self) -> Tuple["Material", List[int], bool]:
+        """Canonical material, the slots of this material in its slot order, and whether colours are swapped."""
+        if self.is_canonical:
+            return self, self.white_slots + self.black_slots, False
+        return self.flipped(), self.black_slots + self.white_slots, True
+
+    def without(self, slot: int) -> "Material":
+        white = self.white
+        black = self.black
+        if slot in self.white_slots:
+            white = white[: slot - 1] + white[slot:]
+        else:
+            offset = slot - self.black_slots[0]
+            black = black[: offset - 1] + black[offset:]
+        return Material(f"K{white}K{black}")
+
+    def get_subtables(self) -> List["Material"]:
+        subtables = []
+        for slot in self.white_slots[1:] + self.black_slots[1:]:
+            canonical, _, _ = self.without(slot).get_slot_order()
+            if not canonical.is_trivial and canonical.name not in [subtable.name for subtable in subtables]:
+                subtables.append(canonical)
+        return subtables
+
+
+def get_table_path(directory: str, material: Material) -> str:
+    return os.path.join(directory, f"{material.name}.tb")
+
+
+def get_header(material: Material) -> bytes:
+    return TABLE_MAGIC + TABLE_VERSION.to_bytes(4, "little") + len(material.types).to_bytes(4, "little")
+
+
+_loaded_tables: Dict[str, np.ndarray] = {}
+
+
+def load_table(directory: str, material: Material) -> np.ndarray:
+    """Values of a canonical table as a (2, size) memory map, row 0 with white to move."""
+    path = get_table_path(directory, material)
+    if path not in _loaded_tables:
+        with open(path, "rb") as f:
+            if f.read(HEADER_SIZE) != get_header(material):
+                raise ValueError(f"{path} isn't a version {TABLE_VERSION} {material.name} table")
+        _loaded_tables[path] = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(2, material.size))
+    return _loaded_tables[path]
+
+
+def get_index(squares: List[np.ndarray]) -> np.ndarray:
+    index = np.zeros(np.shape(squares[0]), dtype=np.int64)
+    for slot, slot_squares in enumerate(squares):
+        index |= np.asarray(slot_squares, dtype=np.int64) << (6 * slot)
+    return index
+
+
+def get_squares(indices: np.ndarray, piece_count: int) -> List[np.ndarray]:
+    return [(indices >> (6 * slot)) & 63 for slot in range(piece_count)]
+
+
+def is_attacked(
+    target: np.ndarray, attackers: List[Tuple[str, np.ndarray, Optional[np.ndarray]]], occupied: np.ndarray
+) -> np.ndarray:
+    """Whether target is attacked by any of the (piece type, square, alive mask) attackers, all arrays broadcast."""
+    attacked = np.zeros(np.broadcast(target, occupied).shape, dtype=bool)
+    for piece_type, sq, alive in attackers:
+        hit = REACH_TABLES[piece_type][sq, target] & ((BETWEEN_TABLE[sq, target] & occupied) == 0)
+        if alive is not None:
+            hit &= alive
+        attacked |= hit
+    return attacked
+
+
+def get_occupied(squares: List[np.ndarray]) -> np.ndarray:
+    occupied = np.zeros(np.shape(squares[0]), dtype=np.uint64)
+    for slot_squares in squares:
+        occupied |= SQUARE_BITS[slot_squares]
+    return occupied
+
+
+def decode_values(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Masks of the won and lost values of the side to move, and their distances in plies."""
+    plies = values.astype(np.int16) - 1
+    decided = (values != DRAW) & (values < UNKNOWN)
+    return decided & (plies % 2 == 1), decided & (plies % 2 == 0), plies
+
+
+def analyse_chunk(task: Tuple[str, bool, int, int, str]) -> Dict[str, np.ndarray]:
+    """
+    Starting state of the positions start..stop with one side to move: legal non-capture moves, captures looked up in
+    the smaller tables, mates and stalemates.
+    """
+    material_name, white_to_move, start, stop, directory = task
+    material = Material(material_name)
+    indices = np.arange(start, stop, dtype=np.int64)
+    count = len(indices)
+    squares = get_squares(indices, len(material.types))
+    own = material.white_slots if white_to_move else material.black_slots
+    enemy = material.black_slots if white_to_move else material.white_slots
+
+    valid = np.ones(count, dtype=bool)
+    for first, second in itertools.combinations(range(len(squares)), 2):
+        valid &= squares[first] != squares[second]
+    occupied = get_occupied(squares)
+    valid &= ~is_attacked(squares[enemy[0]], [(material.types[slot], squares[slot], None) for slot in own], occupied)
+    in_check = is_attacked(squares[own[0]], [(material.types[slot], squares[slot], None) for slot in enemy], occupied)
+
+    moves = np.zeros(count, dtype=np.int64)
+    captures = np.zeros(count, dtype=np.int64)
+    capture_win = np.full(count, NOT_SCHEDULED, dtype=np.int16)
+    capture_loss = np.zeros(count, dtype=np.int16)
+    capture_draw = np.zeros(count, dtype=bool)
+
+    for slot in own:
+        from_sq = squares[slot][:, None]
+        targets = REACH_LISTS[material.types[slot]][squares[slot]]
+        legal = valid[:, None] & ((BETWEEN_TABLE[from_sq, targets] & occupied[:, None]) == 0)
+        for other in own + enemy[:1]:
+            legal &= targets != squares[other][:, None]
+        new_occupied = (occupied[:, None] ^ SQUARE_BITS[from_sq]) | SQUARE_BITS[targets]
+        king_sq = targets if slot == own[0] else squares[own[0]][:, None]
+        attackers = [(material.types[other], squares[other][:, None], squares[other][:, None] != targets) for other in enemy]
+        legal &= ~is_attacked(king_sq, attackers, new_occupied)
+
+        captured = np.zeros(legal.shape, dtype=bool)
+        for victim in enemy[1:]:
+            capture = legal & (targets == squares[victim][:, None])
+            captured |= capture
+            rows, columns = np.nonzero(capture)
+            if len(rows) == 0:
+                continue
+            sub_squares = [targets[rows, columns] if other == slot else squares[other][rows] for other in range(len(squares))]
+            values = probe_capture(material, victim, sub_squares, white_to_move=not white_to_move, directory=directory)
+            won, lost, plies = decode_values(values)
+            np.minimum.at(capture_win, rows[lost], plies[lost] + 1)
+            np.maximum.at(capture_loss, rows[won], plies[won] + 1)
+            capture_draw[rows[values == DRAW]] = True
+        moves += (legal & ~captured).sum(axis=1)
+        captures += captured.sum(axis=1)
+
+    value = np.where(valid, UNKNOWN, INVALID).astype(np.uint8)
+    value[valid & (moves + captures == 0) & ~in_check] = DRAW
+    can_lose = valid & ~capture_draw & (capture_win == NOT_SCHEDULED)
+    pending_loss = np.full(count, NOT_SCHEDULED, dtype=np.int16)
+    pending_loss[valid & (moves + captures == 0) & in_check] = 0
+    all_captures_lose = can_lose & (moves == 0) & (captures > 0)
+    pending_loss[all_captures_lose] = capture_loss[all_captures_lose]
+    return {
+        "value": value,
+        "moves": moves.astype(np.uint8),
+        "pending_loss": pending_loss,
+        "capture_win": capture_win,
+        "capture_loss": capture_loss,
+        "can_lose": can_lose,
+    }
+
+
+def probe_capture(
+    material: Material, victim: int, sub_squares: List[np.ndarray], white_to_move: bool, directory: str
+) -> np.ndarray:
+    """Values of the positions after capturing the piece in slot victim, from the side to move's point of view."""
+    remaining = material.without(victim)
+    if remaining.is_trivial:
+        return np.full(len(sub_squares[0]), DRAW, dtype=np.uint8)
+    canonical, slot_order, flipped = remaining.get_slot_order()
+    squares = [sq for slot, sq in enumerate(sub_squares) if slot != victim]
+    index = get_index([squares[slot] for slot in slot_order])
+    table = load_table(directory, canonical)
+    return np.asarray(table[0 if white_to_move != flipped else 1][index])
+
+
+def get_predecessors(material: Material, indices: np.ndarray, white_to_move: bool) -> np.ndarray:
+    """Positions, with the other side to move, that reach the given positions with a move that isn't a capture."""
+    squares = get_squares(indices, len(material.types))
+    occupied = get_occupied(squares)
+    movers = material.black_slots if white_to_move else material.white_slots
+    waiting = material.white_slots if white_to_move else material.black_slots
+    predecessors = []
+    for slot in movers:
+        from_sq = squares[slot][:, None]
+        targets = REACH_LISTS[material.types[slot]][squares[slot]]
+        legal = (BETWEEN_TABLE[from_sq, targets] & occupied[:, None]) == 0
+        for other in range(len(squares)):
+            legal &= targets != squares[other][:, None]
+        new_occupied = (occupied[:, None] ^ SQUARE_BITS[from_sq]) | SQUARE_BITS[targets]
+        attackers = [(material.types[other], targets if other == slot else squares[other][:, None], None) for other in movers]
+        legal &= ~is_attacked(squares[waiting[0]][:, None], attackers, new_occupied)
+        predecessor = indices[:, None] + ((targets - from_sq) << (6 * slot))
+        predecessors.append(predecessor[legal])
+    return np.concatenate(predecessors)
+
+
+def get_all_predecessors(material: Material, indices: np.ndarray, white_to_move: bool) -> np.ndarray:
+    chunks = [np.zeros(0, dtype=np.int64)]
+    for start in range(0, len(indices), CHUNK_SIZE):
+        end = start + CHUNK_SIZE
+        chunks.append(get_predecessors(material, indices[start:end], white_to_move))
+    return np.concatenate(chunks)
+
+
+def run_initial_pass(material: Material, directory: str, work_directory: str, workers: int) -> Dict[str, np.ndarray]:
+    tasks = []
+    for side, white_to_move in enumerate([True, False]):
+        for start in range(0, material.size, CHUNK_SIZE):
+            path = os.path.join(work_directory, f"initial_{side}_{start}.npz")
+            if not os.path.exists(path):
+                tasks.append((material.name, white_to_move, start, min(start + CHUNK_SIZE, material.size), directory))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task, result in zip(tasks, executor.map(analyse_chunk, tasks)):
+            side = 0 if task[1] else 1
+            path = os.path.join(work_directory, f"initial_{side}_{task[2]}.npz")
+            np.savez(path + ".tmp.npz", **result)
+            os.replace(path + ".tmp.npz", path)
+
+    state = {}
+    for side in range(2):
+        chunks = [
+            np.load(os.path.join(work_directory, f"initial_{side}_{start}.npz")) for start in range(0, material.size, CHUNK_SIZE)
+        ]
+        for name in chunks[0].files:
+            state.setdefault(name, []).append(np.concatenate([chunk[name] for chunk in chunks]))
+    return {name: np.stack(sides) for name, sides in state.items()}
+
+
+def solve(material: Material, state: Dict[str, np.ndarray], work_directory: str, level: int = 0) -> np.ndarray:
+    """Works back from the mates one ply at a time until no position changes, the rest are draws."""
+    value = state["value"]
+    moves = state["moves"]
+    pending_loss = state["pending_loss"]
+    next_wins = [state.get("next_wins_0", np.zeros(0, dtype=np.int64)), state.get("next_wins_1", np.zeros(0, dtype=np.int64))]
+    last_checkpoint = time.perf_counter()
+
+    while level <= MAX_PLIES:
+        frontiers = []
+        for side in range(2):
+            unknown = value[side] == UNKNOWN
+            if level % 2 == 0:
+                new = unknown & (pending_loss[side] == level)
+            else:
+                new = unknown & (state["capture_win"][side] == level)
+                new[next_wins[side]] = unknown[next_wins[side]]
+            value[side][new] = level + 1
+            frontiers.append(np.nonzero(new)[0])
+
+        next_wins = [np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)]
+        for side, frontier in enumerate(frontiers):
+            other = 1 - side
+            predecessors = get_all_predecessors(material, frontier, white_to_move=side == 0)
+            predecessors = predecessors[value[other][predecessors] == UNKNOWN]
+            if level % 2 == 0:
+                next_wins[other] = np.unique(predecessors)
+                continue
+            predecessors, counts = np.unique(predecessors, return_counts=True)
+            moves[other][predecessors] -= counts.astype(np.uint8)
+            lost = predecessors[(moves[other][predecessors] == 0) & state["can_lose"][other][predecessors]]
+            pending_loss[other][lost] = np.maximum(level + 1, state["capture_loss"][other][lost])
+
+        level += 1
+        scheduled = (value == UNKNOWN) & (
+            ((pending_loss >= level) & (pending_loss != NOT_SCHEDULED))
+            | ((state["capture_win"] >= level) & (state["capture_win"] != NOT_SCHEDULED))
+        )
+        if not scheduled.any() and len(next_wins[0]) == 0 and len(next_wins[1]) == 0:
+            break
+        if time.perf_counter() - last_checkpoint > CHECKPOINT_SECONDS:
+            save_checkpoint(work_directory, state, next_wins, level)
+            last_checkpoint = time.perf_counter()
+
+    value[value == UNKNOWN] = DRAW
+    return value
+
+
+def save_checkpoint(work_directory: str, state: Dict[str, np.ndarray], next_wins: List[np.ndarray], level: int):
+    path = os.path.join(work_directory, "checkpoint.npz")
+    arrays = dict(state, next_wins_0=next_wins[0], next_wins_1=next_wins[1], level=np.array(level))
+    np.savez(path + ".tmp.npz", **arrays)
+    os.replace(path + ".tmp.npz", path)
+
+
+def generate_table(material: Material, directory: str = config.TABLEBASE_PATH, workers: int = None) -> str:
+    """Writes the table of a canonical material, generating the tables its captures lead to first."""
+    path = get_table_path(directory, material)
+    if os.path.exists(path):
+        return path
+    for subtable in material.get_subtables():
+        generate_table(subtable, directory=directory, workers=workers)
+
+    work_directory = os.path.join(directory, f"{material.name}.work")
+    os.makedirs(work_directory, exist_ok=True)
+    start = time.perf_counter()
+    checkpoint = os.path.join(work_directory, "checkpoint.npz")
+    if os.path.exists(checkpoint):
+        with np.load(checkpoint) as saved:
+            state = {name: saved[name] for name in saved.files}
+        level = int(state.pop("level"))
+    else:
+        state = run_initial_pass(material, directory=directory, work_directory=work_directory, workers=workers or os.cpu_count())
+        level = 0
+    value = solve(material, state, work_directory=work_directory, level=level)
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(get_header(material))
+        f.write(value.tobytes())
+    os.replace(path + ".tmp", path)
+    shutil.rmtree(work_directory)
+    print(f"{material.name}: {describe_table(value)} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return path
+
+
+def describe_table(value: np.ndarray) -> str:
+    won, lost, plies = decode_values(value[0])
+    longest = int(plies[won].max()) if won.any() else 0
+    drawn = int((value[0] == DRAW).sum())
+    return f"{int(won.sum())} won, {int(lost.sum())} lost, {drawn} drawn with white to move, longest win {longest} plies"
+
+
+def get_all_materials(piece_count: int) -> List[Material]:
+    materials = {}
+    for count in range(3, piece_count + 1):
+        for pieces in itertools.product(PIECE_ORDER, repeat=count - 2):
+            for split in range(len(pieces) + 1):
+                canonical, _, _ = Material(f"K{''.join(pieces[:split])}K{''.join(pieces[split:])}").get_slot_order()
+                materials[canonical.name] = canonical
+    return sorted(materials.values(), key=lambda material: (len(material.types), material.name))
+
+
+class Tablebases:
+    """Probes the tables in a directory. Materials without a table, and positions with pawns, give None."""
+
+    def __init__(self, directory: str = config.TABLEBASE_PATH):
+        self.directory = directory
+        # Table, slot order and colour swap per material as named from the position, None when there's no table.
+        # The engine probes at every node with few pieces, so a probe only touches the file system once per material.
+        self.entries: Dict[str, Optional[Tuple[np.ndarray, List[int], bool]]] = {}
+
+    def get_table(self, material: Material) -> Optional[np.ndarray]:
+        if not os.path.exists(get_table_path(self.directory, material)):
+            return None
+        return load_table(self.directory, material)
+
+    def get_entry(self, name: str) -> Optional[Tuple[np.ndarray, List[int], bool]]:
+        if name not in self.entries:
+            canonical, slot_order, flipped = Material(name).get_slot_order()
+            table = self.get_table(canonical)
+            self.entries[name] = None if table is None else (table, slot_order, flipped)
+        return self.entries[name]
+
+    def probe(self, game: Game) -> Optional[ProbeResult]:
+        if len(game.pieces_pos) > MAX_PIECES:
+            return None
+        white = sorted(
+            (name for name in game.pieces_pos if name[0].isupper() and name[0] != "K"), key=lambda name: PIECE_ORDER.find(name[0])
+        )
+        black = sorted(
+            (name for name in game.pieces_pos if name[0].islower() and name[0] != "k"),
+            key=lambda name: PIECE_ORDER.find(name[0].upper()),
+        )
+        if any(name[0].upper() not in PIECE_ORDER for name in white + black):
+            return None
+        if not white and not black:
+            return ProbeResult(wdl=0, plies=0)
+        entry = self.get_entry(f"K{''.join(name[0] for name in white)}K{''.join(name[0].upper() for name in black)}")
+        if entry is None:
+            return None
+        table, slot_order, flipped = entry
+
+        kings = [name for name in game.pieces_pos if name[0] in "Kk"]
+        white_king = next(name for name in kings if name[0] == "K")
+        black_king = next(name for name in kings if name[0] == "k")
+        slots = [white_king] + white + [black_king] + black
+        index = 0
+        for slot, original in enumerate(slot_order):
+            index |= square(game.pieces_pos[slots[original]]) << (6 * slot)
+        value = int(table[0 if game.white_turn != flipped else 1][index])
+        if value == DRAW or value >= UNKNOWN:
+            return ProbeResult(wdl=0, plies=0)
+        plies = value - 1
+        return ProbeResult(wdl=1 if plies % 2 == 1 else -1, plies=plies)
+
+    def best_move(self, game: Game) -> Optional[Tuple[Move, ProbeResult]]:
+        """Quickest win, else a draw, else the longest defence, or None if a position after a move has no table."""
+        best = None
+        best_key = None
+        for piece_name, new_pos in game.get_legal_moves():
+            game.make_move(piece_name=piece_name, new_pos=new_pos)
+            try:
+                reply = self.probe(game)
+            finally:
+                game.unmake_move()
+            if reply is None:
+                return None
+            result = ProbeResult(wdl=-reply.wdl, plies=reply.plies + 1 if reply.wdl else 0)
+            key = (result.wdl, -result.plies if result.wdl > 0 else result.plies)
+            if best_key is None or key > best_key:
+                best = ((piece_name, new_pos), result)
+                best_key = key
+        return best
+
+
+def open_tablebases(directory: Optional[str] = config.TABLEBASE_PATH) -> Optional[Tablebases]:
+    if directory is None or not os.path.isdir(directory):
+        return None
+    return Tablebases(directory)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate pawnless endgame tablebases")
+    parser.add_argument("materials", nargs="*", help="materials like KQK or KRKB")
+    parser.add_argument("--all", type=int, choices=[3, 4], help="generate every table with up to this many pieces")
+    parser.add_argument("--directory", default=config.TABLEBASE_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    materials = get_all_materials(args.all) if args.all else []
+    for name in args.materials:
+        materials.append(Material(name).get_slot_order()[0])
+    if not materials:
+        parser.error("give materials or --all")
+
+    os.makedirs(args.directory, exist_ok=True)
+    for material in materials:
+        generate_table(material, directory=args.directory, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
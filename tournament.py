@@ -0,0 +1,312 @@
+"""
+Headless self-play tournaments for checking engine changes and stressing the rules code.
+
+Every pair of players meets in a round robin, playing the given number of games with alternating colors. Games are
+spread over a process pool and each game is seeded from its index, so a tournament is reproducible regardless of
+the number of workers. The report holds the result of every game, games and moves per second, the average move
+generation time, and Elo estimates.
+
+Players are given as specs:
+    random                        uniformly random legal moves
+    greedy                        captures the most valuable piece it can, otherwise plays randomly
+    engine:nodes=2000,depth=3     Engine search, limited by nodes, depth and/or seconds (time=0.5)
+
+    python tournament.py --players random greedy engine:nodes=1000 --games 50 --workers 4 --output report.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import config
+from bitboard import square
+from engine import PIECE_VALUES, Engine
+from fen import STARTING_FEN, parse_fen
+from game import Game
+from moves import CAPTURE, FLAGS_SHIFT, FROM_MASK, TO_SHIFT, MoveBuffer
+
+DEFAULT_ENGINE_NODES = 2000
+
+
+class RandomPlayer:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def choose_move(self, game: Game, moves: MoveBuffer) -> int:
+        return moves.moves[self.rng.randrange(moves.count)]
+
+
+class GreedyPlayer(RandomPlayer):
+    def choose_move(self, game: Game, moves: MoveBuffer) -> int:
+        best_value = 0
+        best_moves = []
+        for move in moves:
+            if not move >> FLAGS_SHIFT & CAPTURE:
+                continue
+            victim = game.board[move >> TO_SHIFT & FROM_MASK]
+            # En passant captures a pawn that isn't on the target square.
+            value = PIECE_VALUES[victim[0].lower()] if victim else PIECE_VALUES["p"]
+            if value > best_value:
+                best_value = value
+                best_moves = [move]
+            elif value == best_value:
+                best_moves.append(move)
+        if best_moves:
+            return self.rng.choice(best_moves)
+        return super().choose_move(game, moves)
+
+
+class EnginePlayer:
+    def __init__(self, nodes: Optional[int], depth: Optional[int], seconds: Optional[float]):
+        self.engine = Engine(
+            time_limit=seconds if seconds is not None else math.inf,
+            node_limit=nodes,
+            max_depth=depth if depth is not None else config.ENGINE_MAX_DEPTH,
+        )
+
+    def choose_move(self, game: Game, moves: MoveBuffer) -> int:
+        piece_name, new_pos = self.engine.search(game).move
+        from_sq, to_sq = square(game.pieces_pos[piece_name]), square(new_pos)
+        for move in moves:
+            if move & FROM_MASK == from_sq and move >> TO_SHIFT & FROM_MASK == to_sq:
+                return move
+        raise RuntimeError(f"Engine chose {piece_name} to {new_pos}, which isn't legal")
+
+
+def parse_player_spec(spec: str) -> Tuple[str, Dict[str, float]]:
+    name, _, options_text = spec.partition(":")
+    if name not in ["random", "greedy", "engine"]:
+        raise ValueError(f"Unknown player {name}, use random, greedy or engine")
+    options = {}
+    for option in filter(None, options_text.split(",")):
+        key, _, value = option.partition("=")
+        if name != "engine" or key not in ["nodes", "depth", "time"]:
+            raise ValueError(f"Unknown option {key} of player {spec}")
+        options[key] = float(value)
+    return name, options
+
+
+def create_player(spec: str, rng: random.Random):
+    name, options = parse_player_spec(spec)
+    if name == "random":
+        return RandomPlayer(rng)
+    if name == "greedy":
+        return GreedyPlayer(rng)
+    if not options:
+        options = {"nodes": DEFAULT_ENGINE_NODES}
+    return EnginePlayer(
+        nodes=int(options["nodes"]) if "nodes" in options else None,
+        depth=int(options["depth"]) if "depth" in options else None,
+        seconds=options.get("time"),
+    )
+
+
+def play_game(task: Tuple[int, str, str, int, int, str]) -> Dict:
+    """
+    Plays one game like Chess does: make_move, then the legal moves of the new position, and the game ends as
+    Game.get_termination decides. Returns the result from white's point of view and timings.
+    """
+    index, white_spec, black_spec, seed, max_plies, fen = task
+    rng = random.Random(seed)
+    players = {True: create_player(white_spec, rng), False: create_player(black_spec, rng)}
+    game = parse_fen(fen)
+    buffer = MoveBuffer()
+    generation_seconds = 0.0
+    generations = 0
+    start = time.perf_counter()
+    while True:
+        generation_start = time.perf_counter()
+        game.generate_moves(buffer)
+        generation_seconds += time.perf_counter() - generation_start
+        generations += 1
+        termination = game.get_termination(has_legal_move=buffer.count > 0)
+        if termination is not None:
+            result = game.get_result(termination)
+            break
+        if len(game.move_stack) >= max_plies:
+            termination, result = "max plies", "1/2-1/2"
+            break
+        game.make_encoded_move(players[game.white_turn].choose_move(game, buffer))
+
+    return {
+        "game": index,
+        "white": white_spec,
+        "black": black_spec,
+        "result": result,
+        "termination": termination,
+        "plies": len(game.move_stack),
+        "seconds": time.perf_counter() - start,
+        "move_generation_seconds": generation_seconds,
+        "move_generations": generations,
+    }
+
+
+def get_score(result: str, white: bool) -> float:
+    if result == "1/2-1/2":
+        return 0.5
+    return 1.0 if (result == "1-0") == white else 0.0
+
+
+def get_elo_difference(score: float) -> float:
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def get_pairing_stats(games: List[Dict], player: str, opponent: str) -> Dict:
+    """Score of player against opponent, with the Elo difference and its 95% interval."""
+    scores = []
+    for game in games:
+        if {game["white"], game["black"]} == {player, opponent}:
+            scores.append(get_score(game["result"], white=game["white"] == player))
+    count = len(scores)
+    mean = sum(scores) / count
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / count)
+    margin = 1.96 * deviation / math.sqrt(count)
+    return {
+        "player": player,
+        "opponent": opponent,
+        "games": count,
+        "score": mean,
+        "elo": get_elo_difference(mean),
+        "elo_low": get_elo_difference(mean - margin),
+        "elo_high": get_elo_difference(mean + margin),
+    }
+
+
+def fit_ratings(players: List[str], games: List[Dict], iterations: int = 500) -> Dict[str, float]:
+    """
+    Bradley-Terry ratings on the Elo scale with a mean of 0, draws counting as half a win. Every pairing gets one
+    virtual draw, so a player that won or lost every game still gets a finite rating.
+    """
+    scores = {player: 0.0 for player in players}
+    pair_counts: Dict[Tuple[str, str], float] = {}
+    for white in players:
+        for black in players:
+            if white < black:
+                pair_counts[(white, black)] = 1.0
+                scores[white] += 0.5
+                scores[black] += 0.5
+    for game in games:
+        scores[game["white"]] += get_score(game["result"], white=True)
+        scores[game["black"]] += get_score(game["result"], white=False)
+        pair = tuple(sorted([game["white"], game["black"]]))
+        pair_counts[pair] += 1
+
+    strengths = {player: 1.0 for player in players}
+    for _ in range(iterations):
+        for player in players:
+            denominator = 0.0
+            for (first, second), count in pair_counts.items():
+                if player in (first, second):
+                    opponent = second if player == first else first
+                    denominator += count / (strengths[player] + strengths[opponent])
+            if denominator > 0:
+                strengths[player] = scores[player] / denominator
+    ratings = {player: 400 * math.log10(strength) for player, strength in strengths.items()}
+    mean = sum(ratings.values()) / len(ratings)
+    return {player: rating - mean for player, rating in ratings.items()}
+
+
+def get_tasks(players: List[str], games_per_pairing: int, max_plies: int, fen: str, seed: int) -> List[Tuple]:
+    tasks = []
+    for first, second in combinations(players, 2):
+        for round_index in range(games_per_pairing):
+            white, black = (first, second) if round_index % 2 == 0 else (second, first)
+            index = len(tasks)
+            tasks.append((index, white, black, seed * 1000003 + index, max_plies, fen))
+    return tasks
+
+
+def run_tournament(
+    players: List[str], games_per_pairing: int, workers: int, max_plies: int, fen: str = STARTING_FEN, seed: int = 0
+) -> Dict:
+    if len(players) < 2:
+        raise ValueError("A tournament needs at least two players")
+    if len(set(players)) != len(players):
+        raise ValueError("Player specs must be unique")
+    if games_per_pairing < 1:
+        raise ValueError("Every pairing needs at least one game")
+    for spec in players:
+        parse_player_spec(spec)
+    parse_fen(fen)
+
+    tasks = get_tasks(players, games_per_pairing, max_plies, fen, seed)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        games = list(executor.map(play_game, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    seconds = time.perf_counter() - start
+
+    plies = sum(game["plies"] for game in games)
+    generations = sum(game["move_generations"] for game in games)
+    generation_seconds = sum(game["move_generation_seconds"] for game in games)
+    terminations: Dict[str, int] = {}
+    for game in games:
+        terminations[game["termination"]] = terminations.get(game["termination"], 0) + 1
+    ratings = fit_ratings(players, games)
+    standings = []
+    for player in sorted(players, key=lambda player: -ratings[player]):
+        player_games = [game for game in games if player in (game["white"], game["black"])]
+        score = sum(get_score(game["result"], white=game["white"] == player) for game in player_games)
+        standings.append({"player": player, "games": len(player_games), "score": score, "elo": ratings[player]})
+    pairings = [get_pairing_stats(games, first, second) for first, second in combinations(players, 2)]
+
+    return {
+        "players": players,
+        "games": len(games),
+        "workers": workers,
+        "seconds": seconds,
+        "games_per_second": len(games) / seconds if seconds > 0 else 0.0,
+        "moves_per_second": plies / seconds if seconds > 0 else 0.0,
+        "average_plies": plies / len(games),
+        "average_move_generation_us": generation_seconds / generations * 1e6,
+        "terminations": terminations,
+        "standings": standings,
+        "pairings": pairings,
+        "results": games,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Round robin self-play tournament across a process pool")
+    parser.add_argument("--players", nargs="+", default=["random", "greedy", f"engine:nodes={DEFAULT_ENGINE_NODES}"])
+    parser.add_argument("--games", type=int, default=20, help="games per pairing, colors alternate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-plies", type=int, default=300, help="games still running after this many plies are drawn")
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="tournament.json", help="report file")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_tournament(
+            players=args.players,
+            games_per_pairing=args.games,
+            workers=args.workers,
+            max_plies=args.max_plies,
+            fen=args.fen,
+            seed=args.seed,
+        )
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"{report['games']} games in {report['seconds']:.2f}s: {report['games_per_second']:.2f} games/s, "
+        f"{report['moves_per_second']:.0f} moves/s, move generation {report['average_move_generation_us']:.1f} us"
+    )
+    print(", ".join(f"{name}: {count}" for name, count in sorted(report["terminations"].items())))
+    for standing in report["standings"]:
+        print(f"{standing['player']:30} {standing['score']:6.1f}/{standing['games']:<5} Elo {standing['elo']:+7.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import math
 
 import config
+from moves import SQUARE_NAMES
 
 
 def calculate_board_coordinates_from_canvas(x: int, y: int) -> (int):
@@ -16,3 +17,11 @@ def calculate_canvas_coordinates_from_board(x: int, y: int) -> (int):
     canvas_x = x * config.SQUARE_SIZE
     canvas_y = y * config.SQUARE_SIZE
     return canvas_x, canvas_y
+
+
+def get_square_name(pos: list) -> str:
+    return SQUARE_NAMES[pos[1] * 8 + pos[0]]
+
+
+def get_pos_from_square_name(square_name: str) -> list:
+    return [ord(square_name[0]) - ord("a"), 8 - int(square_name[1])]
@@ -0,0 +1,105 @@
+import queue
+import threading
+import tkinter as tk
+import traceback
+from typing import Any, Callable, Optional
+
+import config
+from instrumentation import profiler
+
+
+class Job:
+    def __init__(
+        self,
+        function: Callable[[threading.Event], Any],
+        on_done: Callable[[Any], None],
+        on_error: Optional[Callable[[BaseException], None]] = None,
+    ):
+        self.function = function
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class BackgroundWorker:
+    """
+    Runs jobs one at a time on a daemon thread, so the engine search never blocks the Tk event loop.
+    Results are handed back on the Tk thread by polling with tk_root.after. Submitting a job cancels the previous
+    one; jobs get their cancel event and should return early once it is set. Results of cancelled jobs are dropped.
+    A job that raises is finished like any other, its exception goes to on_error instead of its result to on_done.
+    """
+
+    def __init__(self, tk_root: tk.Tk, poll_ms: int = config.WORKER_POLL_MS):
+        self.tk_root = tk_root
+        self.poll_ms = poll_ms
+        self.jobs: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self.results: "queue.Queue[Job]" = queue.Queue()
+        self.current_job: Optional[Job] = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.poll_id = self.tk_root.after(self.poll_ms, self.poll)
+
+    def submit(
+        self,
+        function: Callable[[threading.Event], Any],
+        on_done: Callable[[Any], None],
+        on_error: Optional[Callable[[BaseException], None]] = None,
+    ) -> Job:
+        self.cancel()
+        job = Job(function=function, on_done=on_done, on_error=on_error)
+        self.current_job = job
+        self.jobs.put(job)
+        return job
+
+    def cancel(self):
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.current_job = None
+
+    @property
+    def is_busy(self) -> bool:
+        return self.current_job is not None
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if job.cancelled:
+                continue
+            try:
+                job.result = profiler.run(job.function, job.cancel_event)
+            except Exception as error:
+                job.error = error
+                traceback.print_exc()
+            self.results.put(job)
+
+    def poll(self):
+        while True:
+            try:
+                job = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if job.cancelled:
+                continue
+            if job is self.current_job:
+                self.current_job = None
+            if job.error is None:
+                job.on_done(job.result)
+            elif job.on_error is not None:
+                job.on_error(job.error)
+        self.poll_id = self.tk_root.after(self.poll_ms, self.poll)
+
+    def stop(self):
+        self.cancel()
+        self.tk_root.after_cancel(self.poll_id)
+        self.jobs.put(None)
@@ -0,0 +1,33 @@
+import random
+from typing import Dict, List
+
+import config
+from bitboard import square
+
+# A fixed seed keeps keys identical across processes and runs, so they can be stored on disk.
+ZOBRIST_SEED = 20221106
+
+_random = random.Random(ZOBRIST_SEED)
+PIECE_KEYS = {piece: [_random.getrandbits(64) for _ in range(64)] for piece in config.PIECE_TYPES}
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+
+
+def get_piece_key(piece: str, pos: List[int]) -> int:
+    return PIECE_KEYS[piece][square(pos)]
+
+
+def get_en_passant_key(en_passant: List) -> int:
+    if len(en_passant) > 0:
+        return EN_PASSANT_KEYS[en_passant[0]]
+    return 0
+
+
+def calculate_key(pieces_pos: Dict[str, List[int]], white_turn: bool, en_passant: List) -> int:
+    """Key of a position computed from scratch."""
+    key = 0
+    for piece_name, pos in pieces_pos.items():
+        key ^= get_piece_key(piece_name[0], pos)
+    if not white_turn:
+        key ^= BLACK_TO_MOVE_KEY
+    return key ^ get_en_passant_key(en_passant)